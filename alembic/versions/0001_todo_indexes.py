@@ -0,0 +1,65 @@
+"""add composite indexes on todos
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # create_all で作成済みの既存DBを取り込むため、テーブルが無い場合のみ作成する
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("username", sa.String(), nullable=True),
+            sa.Column("email", sa.String(), nullable=True),
+            sa.Column("hashed_password", sa.String(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_username", "users", ["username"], unique=True)
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+    if "todos" not in existing:
+        op.create_table(
+            "todos",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("title", sa.String(), nullable=True),
+            sa.Column("details", sa.String(), nullable=True),
+            sa.Column("completed", sa.Boolean(), nullable=True),
+            sa.Column("createdAt", sa.DateTime(), nullable=True),
+            sa.Column("updatedAt", sa.DateTime(), nullable=True),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_todos_id", "todos", ["id"])
+        op.create_index("ix_todos_title", "todos", ["title"])
+
+    # 一覧取得（user_id + キーセット）と完了状態での絞り込み用
+    op.create_index(
+        "ix_todos_user_created_id", "todos", ["user_id", "createdAt", "id"], if_not_exists=True
+    )
+    op.create_index(
+        "ix_todos_user_completed", "todos", ["user_id", "completed"], if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_todos_user_completed", table_name="todos", if_exists=True)
+    op.drop_index("ix_todos_user_created_id", table_name="todos", if_exists=True)
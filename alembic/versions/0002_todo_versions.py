@@ -0,0 +1,49 @@
+"""add per-user todo version and tombstones
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("users", sa.Column("todo_version", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("todos", sa.Column("version", sa.Integer(), nullable=False, server_default="0"))
+    op.create_index("ix_todos_user_version", "todos", ["user_id", "version"])
+    # 既存のタスクをバージョン 1 の変更として扱う（since=0 からの差分取得で返すため）
+    op.execute("UPDATE todos SET version = 1")
+    op.execute("UPDATE users SET todo_version = 1 WHERE id IN (SELECT user_id FROM todos)")
+    op.create_table(
+        "todo_tombstones",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("todo_id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_todo_tombstones_user_version", "todo_tombstones", ["user_id", "version"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_todo_tombstones_user_version", table_name="todo_tombstones")
+    op.drop_table("todo_tombstones")
+    op.drop_index("ix_todos_user_version", table_name="todos")
+    with op.batch_alter_table("todos") as batch_op:
+        batch_op.drop_column("version")
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("todo_version")
@@ -0,0 +1,65 @@
+"""add full-text search on todo title and details
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# app/models.py の SQLITE_FTS_DDL と同じ定義
+SQLITE_FTS_DDL = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS todos_fts USING fts5(
+        title, details, user_id,
+        content='todos', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS todos_fts_ai AFTER INSERT ON todos BEGIN
+        INSERT INTO todos_fts(rowid, title, details, user_id) VALUES (new.id, new.title, new.details, new.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS todos_fts_ad AFTER DELETE ON todos BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, title, details, user_id) VALUES ('delete', old.id, old.title, old.details, old.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS todos_fts_au AFTER UPDATE OF title, details, user_id ON todos BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, title, details, user_id) VALUES ('delete', old.id, old.title, old.details, old.user_id);
+        INSERT INTO todos_fts(rowid, title, details, user_id) VALUES (new.id, new.title, new.details, new.user_id);
+    END""",
+)
+
+POSTGRES_SEARCH_VECTOR = "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(details, ''))"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        for statement in SQLITE_FTS_DDL:
+            op.execute(statement)
+        # 既存のタスクを索引に登録
+        op.execute("INSERT INTO todos_fts(todos_fts) VALUES ('rebuild')")
+    elif dialect == "postgresql":
+        op.create_index(
+            "ix_todos_search", "todos", [sa.text(POSTGRES_SEARCH_VECTOR)],
+            postgresql_using="gin", if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        for trigger in ("todos_fts_au", "todos_fts_ad", "todos_fts_ai"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS todos_fts")
+    elif dialect == "postgresql":
+        op.drop_index("ix_todos_search", table_name="todos", if_exists=True)
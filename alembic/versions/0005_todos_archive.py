@@ -0,0 +1,45 @@
+"""add todos archive
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_todos_completed_updated", "todos", ["completed", "updatedAt"])
+    op.create_table(
+        "todos_archive",
+        sa.Column("archive_id", sa.Integer(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(), nullable=True),
+        sa.Column("details", sa.String(), nullable=True),
+        sa.Column("completed", sa.Boolean(), nullable=False),
+        sa.Column("createdAt", sa.DateTime(), nullable=True),
+        sa.Column("updatedAt", sa.DateTime(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("archivedAt", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("archive_id"),
+    )
+    op.create_index("ix_todos_archive_user_created_id", "todos_archive", ["user_id", "createdAt", "id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_todos_archive_user_created_id", table_name="todos_archive")
+    op.drop_table("todos_archive")
+    op.drop_index("ix_todos_completed_updated", table_name="todos")
@@ -0,0 +1,50 @@
+"""add per-user todo counters
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "user_todo_stats",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("total", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("completed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("archived", sa.Integer(), nullable=False, server_default="0"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    # 既存のタスクから件数を集計する
+    op.execute(
+        """
+        INSERT INTO user_todo_stats (user_id, total, completed, archived)
+        SELECT user_id, SUM(total), SUM(completed), SUM(archived)
+        FROM (
+            SELECT user_id, COUNT(*) AS total, SUM(CASE WHEN completed THEN 1 ELSE 0 END) AS completed, 0 AS archived
+            FROM todos GROUP BY user_id
+            UNION ALL
+            SELECT user_id, 0, 0, COUNT(*) FROM todos_archive GROUP BY user_id
+        ) AS counts
+        GROUP BY user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("user_todo_stats")
@@ -0,0 +1,131 @@
+"""
+古い完了済みタスクのアーカイブ
+完了後 ARCHIVE_AFTER_DAYS 日以上更新されていないタスクを todos から todos_archive に移し、一覧や索引を小さく保つ
+1トランザクションは ARCHIVE_BATCH_SIZE 件までとし、バッチの間は ARCHIVE_BATCH_PAUSE_MS だけ待って通常の書き込みを優先する
+バッチごとにコミットするため、途中で止めても次回の実行で続きから再開できる
+
+    python -m app.archive --older-than-days 90
+
+ARCHIVE_INTERVAL_SECONDS を指定するとアプリの起動中に定期実行する（python -m app.serve で複数ワーカーを起動した場合は1つのワーカーだけで実行する）
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from . import crud, events
+from .database import run_in_new_session
+from .events import TodoEvent
+from .metrics import Counter, registry
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_BATCH_PAUSE_MS = int(os.getenv("ARCHIVE_BATCH_PAUSE_MS", "50"))
+# 定期実行の間隔（秒）。0 の場合は定期実行しない
+ARCHIVE_INTERVAL_SECONDS = int(os.getenv("ARCHIVE_INTERVAL_SECONDS", "0"))
+
+ARCHIVED_TODOS = registry.register(Counter("archived_todos_total", "アーカイブに移したタスク数"))
+
+
+async def archive_completed(
+    older_than_days: int = ARCHIVE_AFTER_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    pause_ms: int = ARCHIVE_BATCH_PAUSE_MS,
+    max_batches: Optional[int] = None,
+) -> dict:
+    """対象がなくなる（または max_batches に達する）までバッチ単位でアーカイブし、実行結果を返す"""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    start = time.perf_counter()
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        archived = await run_in_new_session(crud.archive_completed_todos, cutoff, batch_size)
+        if not archived:
+            break
+        batches += 1
+        moved += len(archived)
+        ARCHIVED_TODOS.inc(amount=len(archived))
+        await _publish_refresh(archived)
+        if len(archived) < batch_size:
+            break
+        await asyncio.sleep(pause_ms / 1000)
+
+    result = {
+        "moved": moved,
+        "batches": batches,
+        "cutoff": cutoff.isoformat(),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    logger.info("アーカイブ完了", extra={"archive": result})
+    return result
+
+
+# 接続中のクライアントには、タスクごとではなくユーザーごとに再取得を促す
+async def _publish_refresh(archived) -> None:
+    versions = {}
+    for user_id, _, version in archived:
+        versions[user_id] = version
+    for user_id, version in versions.items():
+        try:
+            await events.publish(TodoEvent("refresh", user_id, version))
+        except Exception:
+            logger.exception("変更イベントの配信に失敗", extra={"user_id": user_id, "event": "refresh"})
+
+
+# ---- 定期実行 ----
+
+_task: Optional[asyncio.Task] = None
+
+
+async def _run_periodically(interval: int) -> None:
+    while True:
+        try:
+            await archive_completed()
+        except Exception:
+            logger.exception("アーカイブに失敗")
+        await asyncio.sleep(interval)
+
+
+# app.serve が fork したワーカーでは、番号 0 のワーカーだけが定期実行する（単独で起動した場合は常に実行する）
+def _is_designated_worker() -> bool:
+    return os.getenv("WEB_WORKER_INDEX", "0") == "0"
+
+
+# 定期実行を開始する（起動時に呼び出す。ARCHIVE_INTERVAL_SECONDS が 0 の場合は何もしない）
+def start_periodic_archive(interval: int = ARCHIVE_INTERVAL_SECONDS) -> None:
+    global _task
+    if interval > 0 and _task is None and _is_designated_worker():
+        _task = asyncio.create_task(_run_periodically(interval))
+
+
+async def stop_periodic_archive() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--pause-ms", type=int, default=ARCHIVE_BATCH_PAUSE_MS)
+    parser.add_argument("--max-batches", type=int, default=None, help="1回の実行で処理する最大バッチ数")
+    args = parser.parse_args()
+
+    result = asyncio.run(archive_completed(args.older_than_days, args.batch_size, args.pause_ms, args.max_batches))
+    print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,758 @@
+"""
+DB操作関数
+すべて同期セッションを受け取る関数として定義し、ルートからは database.run_db 経由で呼び出す
+（非同期モードでは AsyncSession.run_sync により非同期ドライバ上で実行される）
+"""
+import re
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Row, Select, and_, bindparam, case, column, delete, func, insert, literal_column, or_, select, table, text, true, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.models import IdempotencyRecord, RefreshToken, Todo, TodoArchive, TodoTombstone, User, UserTodoStats, todo_search_vector
+from app.schemas import TodoResponse
+
+
+# ---- ユーザー ----
+
+def find_user(db: Session, **filters) -> Optional[User]:
+    return db.query(User).filter_by(**filters).first()
+
+
+def get_user_by_username(db: Session, username: str) -> Optional[User]:
+    return db.query(User).filter(User.username == username).first()
+
+
+def create_user(db: Session, username: str, email: str, hashed_password: str) -> User:
+    user = User(username=username, email=email, hashed_password=hashed_password)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def update_password_hash(db: Session, user: User, hashed_password: str) -> None:
+    user.hashed_password = hashed_password
+    db.commit()
+
+
+# ---- リフレッシュトークン ----
+
+# リフレッシュトークンを保存する（同じユーザーの期限切れトークンはここで削除する）
+def create_refresh_token(db: Session, user_id: int, token_hash: str, family_id: str, expires_at: datetime) -> None:
+    tokens = RefreshToken.__table__
+    db.execute(delete(tokens).where(tokens.c.user_id == user_id, tokens.c.expires_at <= datetime.utcnow()))
+    db.execute(
+        insert(tokens).values(token_hash=token_hash, user_id=user_id, family_id=family_id, expires_at=expires_at)
+    )
+    db.commit()
+
+
+# 系列（同じログインから発行されたトークン）をすべて失効させる
+def _revoke_refresh_family(db: Session, family_id: str, now: datetime) -> int:
+    tokens = RefreshToken.__table__
+    revoked = db.execute(
+        update(tokens)
+        .where(tokens.c.family_id == family_id, tokens.c.revoked_at.is_(None))
+        .values(revoked_at=now)
+    ).rowcount
+    db.commit()
+    return revoked
+
+
+def use_refresh_token(
+    db: Session,
+    token_hash: str,
+    new_token_hash: Optional[str] = None,
+    expires_at: Optional[datetime] = None,
+) -> Tuple[Optional[Row], bool]:
+    """
+    リフレッシュトークンを検証し、(user_id と username を含む行, 再利用を検知したか) を返す
+    new_token_hash を渡すと使用したトークンを失効させて新しいトークンに置き換える
+    失効済みのトークンが使われた場合は、漏洩とみなして系列ごと失効させる
+    """
+    tokens = RefreshToken.__table__
+    now = datetime.utcnow()
+    row = db.execute(
+        select(tokens.c.id, tokens.c.family_id, tokens.c.expires_at, tokens.c.revoked_at, tokens.c.user_id, User.username)
+        .join(User, User.id == tokens.c.user_id)
+        .where(tokens.c.token_hash == token_hash)
+    ).first()
+    if row is None or row.expires_at <= now:
+        return None, False
+    if row.revoked_at is not None:
+        _revoke_refresh_family(db, row.family_id, now)
+        return None, True
+    if new_token_hash is None:
+        return row, False
+
+    # 同じトークンでの同時リクエストは1件だけがローテーションに成功する
+    rotated = db.execute(
+        update(tokens).where(tokens.c.id == row.id, tokens.c.revoked_at.is_(None)).values(revoked_at=now)
+    ).rowcount
+    if not rotated:
+        db.rollback()
+        _revoke_refresh_family(db, row.family_id, now)
+        return None, True
+    db.execute(
+        insert(tokens).values(
+            token_hash=new_token_hash, user_id=row.user_id, family_id=row.family_id, expires_at=expires_at
+        )
+    )
+    db.commit()
+    return row, False
+
+
+# ログアウト：トークンの系列をすべて失効させる（失効させた件数を返す）
+def revoke_refresh_token(db: Session, token_hash: str) -> int:
+    tokens = RefreshToken.__table__
+    family_id = db.execute(select(tokens.c.family_id).where(tokens.c.token_hash == token_hash)).scalar()
+    if family_id is None:
+        return 0
+    return _revoke_refresh_family(db, family_id, datetime.utcnow())
+
+
+# ---- Idempotency-Key ----
+
+# 期限内の保存済みレスポンスを返す（なければ None）
+def get_idempotency_record(db: Session, user_id: int, key: str) -> Optional[Row]:
+    records = IdempotencyRecord.__table__
+    return db.execute(
+        select(records.c.fingerprint, records.c.status_code, records.c.response)
+        .where(records.c.user_id == user_id, records.c.key == key, records.c.expires_at > datetime.utcnow())
+    ).first()
+
+
+# レスポンスを保存する（同じユーザーの期限切れのキーはここで削除する）
+# 他のプロセスが先に同じキーを保存していた場合は何もしない
+def save_idempotency_record(
+    db: Session, user_id: int, key: str, fingerprint: str, status_code: int, response: str, expires_at: datetime
+) -> None:
+    records = IdempotencyRecord.__table__
+    db.execute(delete(records).where(records.c.user_id == user_id, records.c.expires_at <= datetime.utcnow()))
+    try:
+        db.execute(
+            insert(records).values(
+                user_id=user_id, key=key, fingerprint=fingerprint,
+                status_code=status_code, response=response, expires_at=expires_at,
+            )
+        )
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+
+
+# ---- 変更バージョン ----
+
+# ユーザーの変更バージョンを1つ進めて新しい値を返す
+# users の行がロックされるため、同じユーザーへの書き込みはコミットまで直列化される
+# 変更ごとに1文増えるため、一括操作（apply_batch）とまとめ書き込み（apply_coalesced_writes）では
+# 項目ごとではなくトランザクションごと・ユーザーごとに1回だけ呼び出す
+def _bump_version(db: Session, user_id: int) -> int:
+    users = User.__table__
+    return db.execute(
+        update(users)
+        .where(users.c.id == user_id)
+        .values(todo_version=users.c.todo_version + 1)
+        .returning(users.c.todo_version)
+    ).scalar_one()
+
+
+# todos テーブルを読まずに現在のバージョンだけを取得する（ETag 用）
+def get_todo_version(db: Session, user_id: int) -> int:
+    return db.execute(select(User.todo_version).where(User.id == user_id)).scalar_one()
+
+
+# ---- 件数の集計 ----
+
+# ユーザーのタスク件数を増減する（タスクを変更するトランザクション内で、_bump_version の後に呼び出す）
+# users の行ロックにより同じユーザーの更新は直列化されるため、行がなければそのまま追加できる
+def _adjust_stats(db: Session, user_id: int, total: int = 0, completed: int = 0, archived: int = 0) -> None:
+    if not (total or completed or archived):
+        return
+    stats = UserTodoStats.__table__
+    updated = db.execute(
+        update(stats)
+        .where(stats.c.user_id == user_id)
+        .values(
+            total=stats.c.total + total,
+            completed=stats.c.completed + completed,
+            archived=stats.c.archived + archived,
+        )
+    ).rowcount
+    if not updated:
+        db.execute(insert(stats).values(user_id=user_id, total=total, completed=completed, archived=archived))
+
+
+def get_todo_stats(db: Session, user_id: int) -> dict:
+    """集計済みの件数を返す（タスクがまだないユーザーはすべて 0）"""
+    row = db.execute(
+        select(UserTodoStats.total, UserTodoStats.completed, UserTodoStats.archived)
+        .where(UserTodoStats.user_id == user_id)
+    ).first()
+    total, completed, archived = row if row is not None else (0, 0, 0)
+    return {"total": total, "completed": completed, "pending": total - completed, "archived": archived}
+
+
+def reconcile_todo_stats(db: Session, fix: bool = True) -> List[dict]:
+    """
+    todos / todos_archive を集計し直して user_todo_stats と比較し、ずれのあるユーザーを返す
+    fix=True の場合は集計結果で user_todo_stats を作り直す
+    """
+    stats = UserTodoStats.__table__
+    if fix and db.get_bind().dialect.name == "postgresql":
+        # 作り直す間に通常の更新が割り込まないようにする（読み取りは妨げない）
+        db.execute(text("LOCK TABLE user_todo_stats IN EXCLUSIVE MODE"))
+    # SQLite では最初の書き込みでDBの書き込みロックを取るため、以降の集計中に他の更新は入らない
+    stored_rows = (
+        db.execute(delete(stats).returning(stats.c.user_id, stats.c.total, stats.c.completed, stats.c.archived)).all()
+        if fix
+        else db.execute(select(stats.c.user_id, stats.c.total, stats.c.completed, stats.c.archived)).all()
+    )
+    stored = {row.user_id: (row.total, row.completed, row.archived) for row in stored_rows}
+
+    actual = defaultdict(lambda: [0, 0, 0])
+    for user_id, total, completed in db.execute(
+        select(Todo.user_id, func.count(), func.coalesce(func.sum(case((Todo.completed == true(), 1), else_=0)), 0))
+        .group_by(Todo.user_id)
+    ):
+        actual[user_id][0:2] = [total, completed]
+    for user_id, archived in db.execute(select(TodoArchive.user_id, func.count()).group_by(TodoArchive.user_id)):
+        actual[user_id][2] = archived
+
+    drift = []
+    for user_id in sorted(stored.keys() | actual.keys()):
+        expected = tuple(actual.get(user_id, (0, 0, 0)))
+        current = stored.get(user_id, (0, 0, 0))
+        if current != expected:
+            drift.append({
+                "user_id": user_id,
+                "stored": dict(zip(("total", "completed", "archived"), current)),
+                "actual": dict(zip(("total", "completed", "archived"), expected)),
+            })
+
+    if fix:
+        values = [
+            {"user_id": user_id, "total": total, "completed": completed, "archived": archived}
+            for user_id, (total, completed, archived) in actual.items()
+        ]
+        if values:
+            db.execute(insert(stats), values)
+        db.commit()
+    return drift
+
+
+def list_changes(db: Session, user_id: int, since: int) -> Tuple[int, List[Todo], List[int]]:
+    """
+    since より後に変更・削除されたタスクを返す
+    戻り値は (現在のバージョン, 変更されたタスク, 削除されたタスクのID)
+    バージョンを先に読むため、次回その値を since に指定すれば変更を取りこぼさない
+    """
+    version = get_todo_version(db, user_id)
+    todos = (
+        db.query(Todo)
+        .filter(Todo.user_id == user_id, Todo.version > since)
+        .order_by(Todo.version, Todo.id)
+        .all()
+    )
+    # 削除後に同じIDが再利用された場合は現在の行を優先する
+    current_ids = {todo.id for todo in todos}
+    deleted = [
+        todo_id
+        for todo_id in db.scalars(
+            select(TodoTombstone.todo_id)
+            .where(TodoTombstone.user_id == user_id, TodoTombstone.version > since)
+            .order_by(TodoTombstone.version, TodoTombstone.id)
+        )
+        if todo_id not in current_ids
+    ]
+    return version, todos, deleted
+
+
+# ---- タスク ----
+
+def _list_query(
+    entities: Sequence,
+    user_id: int,
+    *,
+    limit: Optional[int] = None,
+    cursor: Optional[Tuple[datetime, int]] = None,
+    completed: Optional[bool] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    updated_after: Optional[datetime] = None,
+    updated_before: Optional[datetime] = None,
+) -> Select:
+    """
+    一覧取得の SELECT 文を組み立てる
+    limit を指定した場合は (createdAt, id) 順で cursor の次から limit 件を返す
+    """
+    stmt = select(*entities).where(Todo.user_id == user_id)
+
+    # サーバー側フィルター
+    if completed is not None:
+        stmt = stmt.where(Todo.completed == completed)
+    if created_after is not None:
+        stmt = stmt.where(Todo.createdAt > created_after)
+    if created_before is not None:
+        stmt = stmt.where(Todo.createdAt < created_before)
+    if updated_after is not None:
+        stmt = stmt.where(Todo.updatedAt > updated_after)
+    if updated_before is not None:
+        stmt = stmt.where(Todo.updatedAt < updated_before)
+
+    # レガシーモード：ページネーションなしで全件返す
+    if limit is None:
+        return stmt
+
+    if cursor is not None:
+        cursor_created_at, cursor_id = cursor
+        stmt = stmt.where(or_(
+            Todo.createdAt > cursor_created_at,
+            and_(Todo.createdAt == cursor_created_at, Todo.id > cursor_id),
+        ))
+    return stmt.order_by(Todo.createdAt, Todo.id).limit(limit)
+
+
+def list_todos(db: Session, user_id: int, **options) -> List[Todo]:
+    """ユーザーのタスクを ORM オブジェクトで取得する（オプションは _list_query と同じ）"""
+    return list(db.scalars(_list_query((Todo,), user_id, **options)))
+
+
+def list_todo_rows(db: Session, user_id: int, columns: Sequence, **options) -> List[Row]:
+    """
+    指定した列だけをタプルで取得する（ORM オブジェクトを作らない高速版）
+    オプションは _list_query と同じ
+    """
+    return db.execute(_list_query(columns, user_id, **options)).all()
+
+
+# ---- 全文検索 ----
+
+# 検索語の最大数
+MAX_SEARCH_TERMS = 10
+# SQLite の FTS5 テーブル（app/models.py の SQLITE_FTS_DDL で作成）
+_todos_fts = table("todos_fts", column("rowid"))
+
+
+def parse_search_terms(q: str) -> List[str]:
+    """検索文字列を語に分割する（記号は区切りとして扱うため、検索構文として解釈されない）"""
+    return re.findall(r"\w+", q)[:MAX_SEARCH_TERMS]
+
+
+def search_todo_rows(
+    db: Session,
+    user_id: int,
+    columns: Sequence,
+    terms: List[str],
+    *,
+    limit: int,
+    cursor: Optional[Tuple[float, int]] = None,
+) -> List[Row]:
+    """
+    title / details の全文検索。すべての語を含むタスクを関連度順に返す
+    入力途中の検索に対応するため、最後の語だけは前方一致にする
+    （頻出語の前方一致は展開に時間がかかるため、すべての語には適用しない）
+    各行の末尾に (score, id) を付ける（score は小さいほど関連度が高い）
+    SQLite は FTS5 の bm25、PostgreSQL は tsvector の ts_rank で順位付けする
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        # user_id も FTS5 に索引しているため、ユーザーの絞り込みも MATCH で行う
+        phrases = [f'"{term}"' for term in terms]
+        phrases[-1] += "*"
+        match = f'user_id : "{user_id}" AND {{title details}} : (' + " ".join(phrases) + ")"
+        score = func.bm25(literal_column("todos_fts"), 10.0, 1.0, 0.0)
+        stmt = (
+            select(*columns, score, Todo.id)
+            .join(_todos_fts, _todos_fts.c.rowid == Todo.id)
+            .where(literal_column("todos_fts").op("MATCH")(match), Todo.user_id == user_id)
+        )
+    else:
+        lexemes = list(terms)
+        lexemes[-1] += ":*"
+        tsquery = func.to_tsquery(literal_column("'simple'"), " & ".join(lexemes))
+        score = -func.ts_rank(todo_search_vector, tsquery)
+        stmt = select(*columns, score, Todo.id).where(Todo.user_id == user_id, todo_search_vector.op("@@")(tsquery))
+
+    if cursor is not None:
+        cursor_score, cursor_id = cursor
+        stmt = stmt.where(or_(score > cursor_score, and_(score == cursor_score, Todo.id > cursor_id)))
+    return db.execute(stmt.order_by(score, Todo.id).limit(limit)).all()
+
+
+# ---- エクスポート・インポート ----
+
+def export_query(user_id: int, columns: Sequence) -> Select:
+    """エクスポート用の SELECT 文（id 順）"""
+    return select(*columns).where(Todo.user_id == user_id).order_by(Todo.id)
+
+
+def import_todos(db: Session, user_id: int, rows: List[dict]) -> int:
+    """複数のタスクを1トランザクションでまとめて追加し、新しい変更バージョンを返す"""
+    try:
+        version = _bump_version(db, user_id)
+        db.execute(insert(Todo), [{**row, "user_id": user_id, "version": version} for row in rows])
+        _adjust_stats(db, user_id, total=len(rows), completed=sum(1 for row in rows if row.get("completed")))
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+        raise
+    return version
+
+
+def create_todo(db: Session, user_id: int, data: dict) -> Todo:
+    todo = Todo(**data, user_id=user_id, version=_bump_version(db, user_id))
+    db.add(todo)
+    _adjust_stats(db, user_id, total=1, completed=1 if data.get("completed") else 0)
+    db.commit()
+    db.refresh(todo)
+    return todo
+
+
+# 完了状態を反転した行から、完了件数の増減を求める
+def _completed_delta(rows) -> int:
+    return sum(1 if row.completed else -1 for row in rows)
+
+
+# RETURNING で返す列（コミット後に失効しないよう ORM オブジェクトではなく行で返す）
+TODO_COLUMNS = (Todo.id, Todo.title, Todo.details, Todo.completed, Todo.createdAt, Todo.updatedAt, Todo.user_id, Todo.version)
+
+
+# 所有者チェック付きの UPDATE ... RETURNING を1文で実行する（該当なしは None）
+# タスク自体の読み書きはこの1文だが、変更バージョンの更新（_bump_version）と、完了状態が変わる場合は
+# 件数の更新（_adjust_stats）も同じトランザクションで実行するため、切り替え1回あたりの SQL は3文になる
+# 該当なしの場合はバージョンの更新も取り消す
+def _update_returning(db: Session, user_id: int, todo_id: int, values: dict):
+    version = _bump_version(db, user_id)
+    row = db.execute(
+        update(Todo)
+        .where(Todo.id == todo_id, Todo.user_id == user_id)
+        .values(**values, version=version)
+        .returning(*TODO_COLUMNS)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        db.rollback()
+        return None
+    if "completed" in values:
+        _adjust_stats(db, user_id, completed=_completed_delta([row]))
+    db.commit()
+    return row
+
+
+def update_todo(db: Session, user_id: int, todo_id: int, data: dict):
+    if not data:
+        return db.execute(
+            select(*TODO_COLUMNS).where(Todo.id == todo_id, Todo.user_id == user_id)
+        ).first()
+    return _update_returning(db, user_id, todo_id, data)
+
+
+def _delete_returning(db: Session, user_id: int, ids: List[int], version: int) -> set:
+    """削除したIDを返し、差分取得用に削除記録を残す"""
+    rows = db.execute(
+        delete(Todo)
+        .where(Todo.user_id == user_id, Todo.id.in_(ids))
+        .returning(Todo.id, Todo.completed)
+        .execution_options(synchronize_session=False)
+    ).all()
+    deleted = {row.id for row in rows}
+    if deleted:
+        db.execute(
+            insert(TodoTombstone),
+            [{"user_id": user_id, "todo_id": todo_id, "version": version} for todo_id in deleted],
+        )
+        _adjust_stats(db, user_id, total=-len(rows), completed=-sum(1 for row in rows if row.completed))
+    return deleted
+
+
+# 削除した場合は新しい変更バージョン、該当なしの場合は None を返す
+def delete_todo(db: Session, user_id: int, todo_id: int) -> Optional[int]:
+    version = _bump_version(db, user_id)
+    if not _delete_returning(db, user_id, [todo_id], version):
+        db.rollback()
+        return None
+    db.commit()
+    return version
+
+
+# 完了状態の反転もDB側で行い、同時に切り替えても更新が失われないようにする
+def toggle_todo(db: Session, user_id: int, todo_id: int):
+    return _update_returning(db, user_id, todo_id, {"completed": ~Todo.completed})
+
+
+# ---- アーカイブ ----
+
+# todos_archive に移す列（TodoArchive と同じ名前）
+ARCHIVE_COLUMNS = (Todo.id, Todo.title, Todo.details, Todo.completed, Todo.createdAt, Todo.updatedAt, Todo.user_id)
+
+
+def archive_completed_todos(db: Session, cutoff: datetime, batch_size: int) -> List[Tuple[int, int, int]]:
+    """
+    updatedAt が cutoff より前の完了済みタスクを最大 batch_size 件、1トランザクションで todos_archive に移す
+    移したタスクの (user_id, id, 変更バージョン) を返す（空なら対象なし）
+    差分取得で削除として伝わるよう、ユーザーごとにバージョンを進めて削除記録を残す
+    """
+    candidates = db.execute(
+        select(Todo.id, Todo.user_id)
+        .where(Todo.completed == true(), Todo.updatedAt < cutoff)
+        .order_by(Todo.updatedAt, Todo.id)
+        .limit(batch_size)
+    ).all()
+    if not candidates:
+        return []
+
+    try:
+        # 他の書き込みと同じく users の行を先にロックする（デッドロックしないよう ID 順）
+        versions = {user_id: _bump_version(db, user_id) for user_id in sorted({row.user_id for row in candidates})}
+        # 抽出した後に未完了に戻されたタスクは移さない
+        rows = db.execute(
+            delete(Todo)
+            .where(Todo.id.in_([row.id for row in candidates]), Todo.completed == true(), Todo.updatedAt < cutoff)
+            .returning(*ARCHIVE_COLUMNS)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if rows:
+            db.execute(insert(TodoArchive), [dict(row._mapping) for row in rows])
+            db.execute(
+                insert(TodoTombstone),
+                [{"user_id": row.user_id, "todo_id": row.id, "version": versions[row.user_id]} for row in rows],
+            )
+            for user_id, moved in Counter(row.user_id for row in rows).items():
+                _adjust_stats(db, user_id, total=-moved, completed=-moved, archived=moved)
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+        raise
+    return [(row.user_id, row.id, versions[row.user_id]) for row in rows]
+
+
+def list_archived_rows(
+    db: Session,
+    user_id: int,
+    columns: Sequence,
+    *,
+    limit: int,
+    cursor: Optional[Tuple[datetime, int]] = None,
+) -> List[Row]:
+    """アーカイブされたタスクを (createdAt, id) 順で cursor の次から limit 件返す"""
+    stmt = select(*columns).where(TodoArchive.user_id == user_id)
+    if cursor is not None:
+        cursor_created_at, cursor_id = cursor
+        stmt = stmt.where(or_(
+            TodoArchive.createdAt > cursor_created_at,
+            and_(TodoArchive.createdAt == cursor_created_at, TodoArchive.id > cursor_id),
+        ))
+    return db.execute(stmt.order_by(TodoArchive.createdAt, TodoArchive.id).limit(limit)).all()
+
+
+# ---- まとめ書き込み ----
+
+def apply_coalesced_writes(db: Session, writes: List[Tuple[str, int, Any]]) -> List[Optional[Row]]:
+    """
+    複数リクエストの作成・完了切り替えを1トランザクションでまとめて実行する（write_coalescer から呼び出す）
+    writes は (種類, user_id, 内容) のリストで、create は作成内容の dict、toggle はタスクIDを渡す
+    結果は writes と同じ順に、作成・切り替え後の行（該当なしの toggle は None）を返す
+    変更バージョンはユーザーごとに1回だけ進める（一括操作と同じく、同じグループ内の変更は同じバージョンになる）
+    """
+    toggle_ids = [payload for kind, _, payload in writes if kind == "toggle"]
+    owners = dict(db.execute(select(Todo.id, Todo.user_id).where(Todo.id.in_(toggle_ids))).tuples().all()) if toggle_ids else {}
+    user_ids = {
+        user_id for kind, user_id, payload in writes
+        if kind == "create" or owners.get(payload) == user_id
+    }
+
+    results: List[Optional[Row]] = [None] * len(writes)
+    try:
+        # 複数プロセスで同時に実行してもデッドロックしないよう、ユーザーの行は ID 順にロックする
+        versions = {user_id: _bump_version(db, user_id) for user_id in sorted(user_ids)}
+
+        creates = [(index, user_id, data) for index, (kind, user_id, data) in enumerate(writes) if kind == "create"]
+        if creates:
+            rows = db.execute(
+                insert(Todo).returning(*TODO_COLUMNS, sort_by_parameter_order=True),
+                [{**data, "user_id": user_id, "version": versions[user_id]} for _, user_id, data in creates],
+            ).all()
+            for (index, _, _), row in zip(creates, rows):
+                results[index] = row
+
+        # 件数はユーザーごとに合計してから1回だけ更新する
+        created = Counter(user_id for _, user_id, _ in creates)
+        completed: Counter = Counter()
+        # 同じタスクの切り替えが複数ある場合も受け付けた順に反映する
+        for index, (kind, user_id, todo_id) in enumerate(writes):
+            if kind == "toggle" and owners.get(todo_id) == user_id:
+                results[index] = db.execute(
+                    update(Todo)
+                    .where(Todo.id == todo_id, Todo.user_id == user_id)
+                    .values(completed=~Todo.completed, version=versions[user_id])
+                    .returning(*TODO_COLUMNS)
+                    .execution_options(synchronize_session=False)
+                ).first()
+                if results[index] is not None:
+                    completed[user_id] += _completed_delta([results[index]])
+        for user_id in sorted(versions):
+            _adjust_stats(db, user_id, total=created[user_id], completed=completed[user_id])
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+        raise
+    return results
+
+
+# ---- 一括操作 ----
+
+# 操作時点の内容を残すため、ORMオブジェクトはその場でレスポンス用スキーマに変換する
+def _batch_result(index: int, op: dict, status: int, todo: Optional[Todo] = None, error: Optional[str] = None) -> dict:
+    return {
+        "index": index,
+        "op": op["op"],
+        "id": todo.id if todo else op.get("id"),
+        "status": status,
+        "todo": TodoResponse.model_validate(todo) if todo else None,
+        "error": error,
+    }
+
+
+def _batch_create(db: Session, user_id: int, version: int, items: list, results: list) -> None:
+    rows = db.execute(
+        insert(Todo).returning(Todo, sort_by_parameter_order=True),
+        [
+            {"title": op["title"], "details": op.get("details"), "user_id": user_id, "version": version}
+            for _, op in items
+        ],
+    ).scalars().all()
+    for (index, op), todo in zip(items, rows):
+        results[index] = _batch_result(index, op, 201, todo)
+    _adjust_stats(db, user_id, total=len(rows))
+
+
+def _batch_update(db: Session, user_id: int, version: int, items: list, results: list) -> None:
+    ids = [op["id"] for _, op in items]
+    owned = set(db.scalars(select(Todo.id).where(Todo.user_id == user_id, Todo.id.in_(ids))))
+
+    # 更新する列の組み合わせごとに executemany でまとめて UPDATE
+    groups = defaultdict(list)
+    for _, op in items:
+        if op["id"] in owned:
+            keys = tuple(key for key in ("title", "details") if key in op)
+            groups[keys].append({"_id": op["id"], **{f"_{key}": op[key] for key in keys}})
+    table = Todo.__table__
+    for keys, params in groups.items():
+        if not keys:
+            continue
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("_id"), table.c.user_id == user_id)
+            .values({**{key: bindparam(f"_{key}") for key in keys}, "version": version})
+        )
+        db.execute(stmt, params)
+
+    updated = {
+        todo.id: todo
+        for todo in db.scalars(
+            select(Todo).where(Todo.id.in_(owned)).execution_options(populate_existing=True)
+        )
+    }
+    for index, op in items:
+        todo = updated.get(op["id"])
+        results[index] = _batch_result(index, op, 200, todo) if todo else _batch_result(index, op, 404, error="Todo not found")
+
+
+def _batch_toggle(db: Session, user_id: int, version: int, items: list, results: list) -> None:
+    ids = [op["id"] for _, op in items]
+    rows = db.execute(
+        update(Todo)
+        .where(Todo.user_id == user_id, Todo.id.in_(ids))
+        .values(completed=~Todo.completed, version=version)
+        .returning(Todo)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    ).scalars().all()
+    toggled = {todo.id: todo for todo in rows}
+    _adjust_stats(db, user_id, completed=_completed_delta(rows))
+    for index, op in items:
+        todo = toggled.get(op["id"])
+        results[index] = _batch_result(index, op, 200, todo) if todo else _batch_result(index, op, 404, error="Todo not found")
+
+
+def _batch_delete(db: Session, user_id: int, version: int, items: list, results: list) -> None:
+    deleted = _delete_returning(db, user_id, [op["id"] for _, op in items], version)
+    for index, op in items:
+        results[index] = _batch_result(index, op, 200) if op["id"] in deleted else _batch_result(index, op, 404, error="Todo not found")
+
+
+_BATCH_HANDLERS = {
+    "create": _batch_create,
+    "update": _batch_update,
+    "toggle": _batch_toggle,
+    "delete": _batch_delete,
+}
+
+
+# 連続する同じ種類の操作をまとめる（同じIDが重複する場合は順序を保つため分割する）
+def _batch_runs(operations: List[dict]):
+    run, run_ids = [], set()
+    for index, op in enumerate(operations):
+        if run and (run[0][1]["op"] != op["op"] or op.get("id") in run_ids):
+            yield run[0][1]["op"], run
+            run, run_ids = [], set()
+        run.append((index, op))
+        if op.get("id") is not None:
+            run_ids.add(op["id"])
+    if run:
+        yield run[0][1]["op"], run
+
+
+# atomic モードで失敗した場合：ロールバックして未実行の操作を 424 にする
+def _abort_batch(db: Session, operations: List[dict], results: list, version: int) -> Tuple[List[dict], bool, int]:
+    db.rollback()
+    for index, op in enumerate(operations):
+        if results[index] is None:
+            results[index] = _batch_result(index, op, 424, error="先行する操作が失敗したため実行されませんでした")
+        else:
+            # ロールバックされた行は返さない
+            results[index]["todo"] = None
+    return results, False, version
+
+
+def apply_batch(db: Session, user_id: int, operations: List[dict], atomic: bool) -> Tuple[List[dict], bool, int]:
+    """
+    create / update / toggle / delete の操作を1トランザクションで実行する
+    atomic=True の場合は1件でも失敗するとすべてロールバックし、
+    False の場合は失敗した操作だけをセーブポイントで取り消して残りをコミットする
+    戻り値は (操作ごとの結果, コミットしたかどうか, 変更バージョン)
+    一括操作全体で変更バージョンは1つだけ進める
+    """
+    results: List[Optional[dict]] = [None] * len(operations)
+    version = _bump_version(db, user_id)
+    for kind, items in _batch_runs(operations):
+        handler = _BATCH_HANDLERS[kind]
+        savepoint = None if atomic else db.begin_nested()
+        try:
+            handler(db, user_id, version, items, results)
+            if savepoint is not None:
+                savepoint.commit()
+        except SQLAlchemyError as e:
+            if atomic:
+                for index, op in items:
+                    results[index] = _batch_result(index, op, 500, error=e.__class__.__name__)
+                return _abort_batch(db, operations, results, version)
+            savepoint.rollback()
+            # まとめて実行できなかった場合は1件ずつ実行して失敗した操作を特定
+            for index, op in items:
+                item_savepoint = db.begin_nested()
+                try:
+                    handler(db, user_id, version, [(index, op)], results)
+                    item_savepoint.commit()
+                except SQLAlchemyError as item_error:
+                    item_savepoint.rollback()
+                    results[index] = _batch_result(index, op, 500, error=item_error.__class__.__name__)
+
+        if atomic and any(results[index]["status"] >= 400 for index, _ in items):
+            return _abort_batch(db, operations, results, version)
+
+    db.commit()
+    return results, True, version
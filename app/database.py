@@ -1,18 +1,123 @@
-from sqlalchemy import create_engine
+import logging
+import os
+from typing import Union
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from app.profiling import profiled
+
+logger = logging.getLogger(__name__)
+
+# データベースのURL（環境変数 DATABASE_URL で指定、未指定ならローカルのSQLite）
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./todo_app.db")
+# Heroku / Railway 形式の postgres:// を SQLAlchemy が解釈できる形式に変換
+if SQLALCHEMY_DATABASE_URL.startswith("postgres://"):
+    SQLALCHEMY_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+# 非同期モード（DB_ASYNC=1）では SQLAlchemy asyncio のエンジンを使う
+DB_ASYNC = os.getenv("DB_ASYNC", "0").lower() in ("1", "true", "yes")
+
+# コネクションプール設定（Postgres などサーバー型DB用）
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# SQLite の接続ごとに設定する PRAGMA
+# WAL により読み込みが書き込みを待たなくなり、busy_timeout でロック競合時に待機する
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    # 負の値はKiB単位（-65536 = 64MiB）
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),
+}
 
-# データベースのURLは環境に合わせて変更してください（例はSQLite）
-SQLALCHEMY_DATABASE_URL = "sqlite:///./todo_app.db"
+# 同期URLから非同期ドライバのURLを作る
+def to_async_url(url: str) -> str:
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+# 接続時に PRAGMA を実行するリスナーを登録
+def _apply_sqlite_pragmas(sync_engine, pragmas: dict) -> None:
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+# 設定内容（起動時ログ用）
+engine_settings: dict = {}
+
+def create_db_engine(url: str, is_async: bool = False):
+    """
+    URL に応じて設定済みのエンジンを作成する
+    SQLite は PRAGMA を接続時に適用し、それ以外はプールサイズなどを設定する
+    """
+    parsed = make_url(url)
+    kwargs = {}
+    settings = {"url": parsed.render_as_string(hide_password=True), "async": is_async}
+
+    if parsed.get_backend_name() == "sqlite":
+        pragmas = dict(SQLITE_PRAGMAS)
+        if parsed.database in (None, "", ":memory:"):
+            # インメモリDBでは WAL / mmap は使えない
+            pragmas.pop("journal_mode")
+            pragmas.pop("mmap_size")
+        if not is_async:
+            kwargs["connect_args"] = {"check_same_thread": False}
+        settings["pragmas"] = pragmas
+    else:
+        kwargs.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+        settings["pool"] = {
+            "size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "timeout": DB_POOL_TIMEOUT,
+            "recycle": DB_POOL_RECYCLE,
+            "pre_ping": True,
+        }
+
+    new_engine = create_async_engine(url, **kwargs) if is_async else create_engine(url, **kwargs)
+    if "pragmas" in settings:
+        _apply_sqlite_pragmas(new_engine.sync_engine if is_async else new_engine, settings["pragmas"])
+    engine_settings["async" if is_async else "sync"] = settings
+    return new_engine
+
+# 起動時に使用中のDB設定を表示
+def log_engine_settings() -> None:
+    for settings in engine_settings.values():
+        logger.info("DB設定", extra={"db": settings})
 
 # エンジン作成
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
 
 # セッションローカル作成
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 非同期エンジンとセッション（非同期モードの場合のみ作成）
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    async_engine = create_db_engine(to_async_url(SQLALCHEMY_DATABASE_URL), is_async=True)
+    # コミット後も属性を参照できるように expire_on_commit=False にする
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Baseクラスの定義（モデルの基底クラス）
 Base = declarative_base()
 
@@ -23,3 +128,56 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# 非同期DBセッションの依存関係
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# ルートで使うセッションの依存関係（設定に応じて同期・非同期を切り替え）
+get_session = get_async_db if DB_ASYNC else get_db
+
+# 同期・非同期どちらのセッションでも使えるDB操作の型
+DbSession = Union[Session, AsyncSession]
+
+# 同期関数 fn(session, *args) をセッションの種類に応じて実行する
+# 非同期セッションでは run_sync で非同期ドライバ上で、同期セッションではスレッドプールで実行する
+async def run_db(db: DbSession, fn, *args, **kwargs):
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(profiled(fn), db, *args, **kwargs)
+
+# リクエストとは別のセッションを開いて fn(session, *args) を実行する（バックグラウンド処理用）
+async def run_in_new_session(fn, *args, **kwargs):
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(fn, *args, **kwargs)
+
+    def call():
+        with SessionLocal() as db:
+            return fn(db, *args, **kwargs)
+
+    return await run_in_threadpool(call)
+
+# SELECT の結果を chunk_size 行ずつ取り出す（ストリーミングレスポンス用）
+# レスポンス送信中も使えるよう、リクエストとは別のセッションでサーバー側カーソルから読む
+async def stream_rows(stmt, chunk_size: int):
+    stmt = stmt.execution_options(yield_per=chunk_size)
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(stmt)
+            async for rows in result.partitions():
+                yield rows
+        return
+
+    db = SessionLocal()
+    try:
+        result = await run_in_threadpool(db.execute, stmt)
+        partitions = result.partitions()
+        while True:
+            rows = await run_in_threadpool(next, partitions, None)
+            if rows is None:
+                break
+            yield rows
+    finally:
+        db.close()
@@ -0,0 +1,117 @@
+"""
+タスクの変更イベントの配信（Server-Sent Events 用の pub/sub）
+ルートは変更をコミットした後に publish し、GET /todos/events の接続ごとに subscribe する
+複数ワーカー構成では EventBus を共有ブローカー（Redis など）を使う実装に差し替える
+"""
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, Optional, Set
+
+from .metrics import FunctionMetric, registry
+
+# 接続ごとに溜めておけるイベント数（超えた場合はその接続に reset を送って切断する）
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "100"))
+
+
+# 変更イベント（version はユーザーの変更バージョンで、SSE のイベントIDとして使う）
+@dataclass(frozen=True)
+class TodoEvent:
+    type: str  # created / updated / toggled / deleted / changed / refresh
+    user_id: int
+    version: int
+    todo_id: Optional[int] = None
+    todo: Optional[dict] = None
+
+    def to_dict(self) -> dict:
+        return {"type": self.type, "id": self.todo_id, "version": self.version, "todo": self.todo}
+
+
+class Subscription:
+    """
+    購読1件分のイベントキュー
+    キューが満杯になった場合は溜まっているイベントを捨て、None を入れて購読側に再同期を促す
+    """
+
+    def __init__(self, user_id: int, max_size: int):
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[Optional[TodoEvent]]" = asyncio.Queue(max_size)
+        self.overflowed = False
+
+    def deliver(self, event: TodoEvent) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self, timeout: float) -> Optional[TodoEvent]:
+        """次のイベントを待つ（タイムアウトした場合は asyncio.TimeoutError）"""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class EventBus(ABC):
+    """イベントバスのインターフェース（publish / subscribe / unsubscribe を実装しないとインスタンス化できない）"""
+
+    @abstractmethod
+    async def publish(self, event: TodoEvent) -> None:
+        ...
+
+    @abstractmethod
+    async def subscribe(self, user_id: int) -> Subscription:
+        ...
+
+    @abstractmethod
+    async def unsubscribe(self, subscription: Subscription) -> None:
+        ...
+
+    def subscriber_count(self) -> int:
+        return 0
+
+
+class InMemoryEventBus(EventBus):
+    """同じプロセス内だけで配信する実装（単一ワーカー・テスト用）"""
+
+    def __init__(self, queue_size: int = SSE_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+
+    async def publish(self, event: TodoEvent) -> None:
+        for subscription in list(self._subscribers.get(event.user_id, ())):
+            subscription.deliver(event)
+
+    async def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    async def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscribers.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscribers[subscription.user_id]
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscribers.values())
+
+
+event_bus: EventBus = InMemoryEventBus()
+
+registry.register(FunctionMetric(
+    "sse_subscribers", "変更イベントの購読数", lambda: event_bus.subscriber_count()))
+
+
+# 使用するイベントバスを差し替える（起動時に呼び出す）
+def set_event_bus(bus: EventBus) -> None:
+    global event_bus
+    event_bus = bus
+
+
+async def publish(event: TodoEvent) -> None:
+    await event_bus.publish(event)
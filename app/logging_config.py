@@ -0,0 +1,136 @@
+"""
+ログ設定
+リクエスト処理中のスレッドは QueueHandler でキューに積むだけにし、
+実際の出力はバックグラウンドの QueueListener が行う
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from app.metrics import FunctionMetric, registry
+
+# 環境変数による設定
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # json / text
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# ロガーごとのDEBUGログのサンプリング率（例: "app.routes.auth=0.01,app.routes.todos=0.1"）
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+
+# LogRecord の標準属性（これ以外は extra として JSON に含める）
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """1行1レコードのJSON形式で出力する"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    ロガー名（前方一致）ごとに DEBUG 以下のレコードを指定の割合だけ通す
+    INFO 以上は常に通す
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # 長い名前（より具体的なロガー）を優先して照合する
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        for name, rate in self.rates:
+            if record.name == name or record.name.startswith(name + "."):
+                return random.random() < rate
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """キューが満杯の場合は待たずに破棄し、破棄した件数を数える"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+queue_handler: Optional[NonBlockingQueueHandler] = None
+
+registry.register(FunctionMetric(
+    "log_records_dropped_total", "キューが満杯で破棄したログの数",
+    lambda: queue_handler.dropped if queue_handler else 0, "counter"))
+
+
+def setup_logging() -> None:
+    """アプリ起動時に一度だけ呼び出す（2回目以降は何もしない）"""
+    global _listener, queue_handler
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    queue_handler.addFilter(SamplingFilter(parse_sample_rates(LOG_SAMPLE_RATES)))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(queue_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """
+    キューに残ったログを出力してからリスナーを停止する
+    停止後のログ（終了処理中のエラーなど）はキューを通さずに直接出力する
+    """
+    global _listener, queue_handler
+    if _listener is None:
+        return
+    _listener.stop()
+    root = logging.getLogger()
+    root.removeHandler(queue_handler)
+    for handler in _listener.handlers:
+        for log_filter in queue_handler.filters:
+            handler.addFilter(log_filter)
+        root.addHandler(handler)
+    _listener = None
+    queue_handler = None
@@ -1,14 +1,30 @@
+"""
+アプリケーションの作成
+create_app() はルーターとミドルウェアを組み立てるだけで、import 時にはDBに接続しない
+スキーマの作成・更新はワーカーごとではなく、起動前に1回だけ python -m app.migrate（または python -m app.serve --migrate）で行う
+
+    uvicorn app.main:app
+    python -m app.serve --workers 4
+"""
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 # 相対インポート → 絶対インポートに変更
-from app.routes import auth, todos
-from app.database import Base, engine
+from app.routes import auth, todos, metrics
+from app.database import engine, async_engine, log_engine_settings
+from app.metrics import MetricsMiddleware, instrument_engine
+from app.profiling import PROFILE_SAMPLE_RATE, PROFILE_TOKEN, ProfilingMiddleware
+from app.logging_config import setup_logging, shutdown_logging
+from app.routes.password_pool import password_pool
+from app.write_coalescer import write_coalescer
+from app.archive import start_periodic_archive, stop_periodic_archive
 
-# モデルをDBに作成
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI()
+# SQL文の実行回数・時間を計測
+instrument_engine(engine)
+if async_engine is not None:
+    instrument_engine(async_engine.sync_engine)
 
 # CORS設定（React側との通信を許可）
 origins = [
@@ -16,16 +32,55 @@ origins = [
     "http://127.0.0.1:3000",
 ]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
-# 認証ルーター → /auth/login などで使える
-app.include_router(auth.router, prefix="/auth")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 起動時にログ設定を行い、使用中のDB設定を出力
+    setup_logging()
+    log_engine_settings()
+    # 古い完了済みタスクのアーカイブを定期実行（ARCHIVE_INTERVAL_SECONDS が 0 の場合は無効）
+    start_periodic_archive()
+    try:
+        yield
+    finally:
+        await stop_periodic_archive()
+        # 終了時に bcrypt 用のワーカープロセスを停止
+        password_pool.shutdown()
+        # 終了時にまとめ実行待ちの書き込みをコミット
+        await write_coalescer.close()
+        # 終了時にキューに残ったログを出力
+        shutdown_logging()
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(lifespan=lifespan)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # ルートごとのリクエスト数・レイテンシ・DB時間を記録
+    app.add_middleware(MetricsMiddleware)
+
+    # PROFILE_TOKEN のヘッダー付き、または PROFILE_SAMPLE_RATE で抽出したリクエストをプロファイリング
+    # （どちらも未設定の場合はミドルウェア自体を追加しない）
+    if PROFILE_TOKEN or PROFILE_SAMPLE_RATE > 0:
+        app.add_middleware(ProfilingMiddleware)
+
+    # 認証ルーター → /auth/login などで使える
+    app.include_router(auth.router, prefix="/auth")
+
+    # todosルーター → `/todos` プレフィックスでルーティング
+    app.include_router(todos.router, prefix="/todos")
+
+    # メトリクス → /metrics（Prometheus テキスト形式）
+    app.include_router(metrics.router)
+
+    return app
+
 
-# todosルーター → `/todos` プレフィックスでルーティング
-app.include_router(todos.router, prefix="/todos")
\ No newline at end of file
+app = create_app()
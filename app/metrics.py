@@ -0,0 +1,285 @@
+"""
+アプリ内メトリクス（Prometheus テキスト形式で /metrics から公開）
+外部ライブラリを使わず、必要なメトリクス型だけを実装する
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# この時間（ミリ秒）以上かかったSQL文をログに出力する（0 で無効）
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# 1リクエストで同じ SELECT 文をこの回数以上実行した場合に N+1 の可能性としてログに出力する（0 で無効）
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+# ログに含めるSQL文の最大文字数
+SLOW_QUERY_MAX_STATEMENT = 1000
+
+# レイテンシ用のバケット（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 1リクエストあたりのSQL文の数用のバケット
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        key = tuple(str(value) for value in label_values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        # ラベル → (バケットごとの件数, 合計, 件数)
+        self._values: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values) -> None:
+        key = tuple(str(v) for v in label_values)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.label_names, key, ("le", _format_value(bound)))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.label_names, key, ("le", "+Inf"))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class FunctionMetric:
+    """描画時に関数を呼び出して値を取得する（他モジュールが持つ統計値の公開用）"""
+
+    def __init__(self, name: str, help_text: str, func: Callable[[], float], kind: str = "gauge"):
+        self.name = name
+        self.help_text = help_text
+        self.func = func
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.kind}",
+            f"{self.name} {_format_value(self.func())}",
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.register(Counter(
+    "http_requests_total", "HTTPリクエスト数", ("method", "route", "status")))
+HTTP_LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTPリクエストの処理時間", ("method", "route", "status")))
+REQUEST_DB_STATEMENTS = registry.register(Histogram(
+    "http_request_db_statements", "1リクエストで実行したSQL文の数", ("method", "route"), COUNT_BUCKETS))
+REQUEST_DB_SECONDS = registry.register(Histogram(
+    "http_request_db_seconds", "1リクエストでDBに費やした時間", ("method", "route")))
+DB_STATEMENTS = registry.register(Counter(
+    "db_statements_total", "実行したSQL文の数"))
+DB_SECONDS = registry.register(Counter(
+    "db_statement_seconds_total", "SQL文の実行時間の合計"))
+BCRYPT_LATENCY = registry.register(Histogram(
+    "bcrypt_duration_seconds", "bcrypt の計算時間（ワーカー内）", ("operation",)))
+DB_SLOW_QUERIES = registry.register(Counter(
+    "db_slow_queries_total", "SLOW_QUERY_MS 以上かかったSQL文の数", ("route",)))
+DB_REPEATED_STATEMENTS = registry.register(Counter(
+    "db_repeated_statements_total", "同じSQL文を繰り返し実行したリクエストの数（N+1 の可能性）", ("method", "route")))
+
+
+# ---- リクエスト単位のDB計測 ----
+
+class RequestStats:
+    __slots__ = ("db_statements", "db_seconds", "statement_counts", "scope")
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.db_statements = 0
+        self.db_seconds = 0.0
+        # SQL文 → 実行回数（N+1 の検出用）
+        self.statement_counts: Dict[str, int] = {}
+        # ルートはルーティング後に scope に設定されるため、scope ごと保持する
+        self.scope = scope
+
+
+# リクエストのルートテンプレート（例: /todos/{task_id}/toggle）
+def route_path(scope: Optional[dict]) -> str:
+    if scope is None:
+        return "<background>"
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+# パラメータの形（値は含めない）：dict はキー、タプルは件数、executemany は件数と先頭の形
+def parameters_shape(parameters, executemany: bool):
+    if executemany:
+        rows = list(parameters) if parameters is not None else []
+        return {"rows": len(rows), "row": parameters_shape(rows[0], False) if rows else None}
+    if isinstance(parameters, dict):
+        return sorted(parameters)
+    if isinstance(parameters, (list, tuple)):
+        return len(parameters)
+    return None
+
+
+# 現在処理中のリクエストの計測値（スレッドプールや run_sync にも引き継がれる）
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+
+def instrument_engine(sync_engine) -> None:
+    """SQL文の実行回数と時間を計測するイベントを登録する（非同期エンジンは sync_engine を渡す）"""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _record_statement(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._metrics_start
+        DB_STATEMENTS.inc()
+        DB_SECONDS.inc(amount=elapsed)
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.db_statements += 1
+            stats.db_seconds += elapsed
+            # 分割して実行する一括 INSERT などを除き、SELECT だけを数える
+            if N_PLUS_ONE_THRESHOLD and not executemany and statement.startswith("SELECT"):
+                stats.statement_counts[statement] = stats.statement_counts.get(statement, 0) + 1
+        if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+            route = route_path(stats.scope if stats is not None else None)
+            DB_SLOW_QUERIES.inc(route)
+            logger.warning("遅いSQL", extra={
+                "statement": statement[:SLOW_QUERY_MAX_STATEMENT],
+                "parameters": parameters_shape(parameters, executemany),
+                "duration_ms": round(elapsed * 1000, 1),
+                "route": route,
+                "method": stats.scope["method"] if stats is not None and stats.scope else None,
+            })
+
+
+# 同じSQL文を閾値以上実行したリクエストを記録する（ループ内でのクエリ発行など）
+def report_repeated_statements(stats: RequestStats, method: str, route: str) -> None:
+    repeated = [
+        (statement, count) for statement, count in stats.statement_counts.items() if count >= N_PLUS_ONE_THRESHOLD
+    ]
+    if not repeated:
+        return
+    DB_REPEATED_STATEMENTS.inc(method, route)
+    for statement, count in repeated:
+        logger.warning("同じSQL文の繰り返し（N+1 の可能性）", extra={
+            "statement": statement[:SLOW_QUERY_MAX_STATEMENT],
+            "count": count,
+            "db_statements": stats.db_statements,
+            "route": route,
+            "method": method,
+        })
+
+
+# ---- ミドルウェア ----
+
+class MetricsMiddleware:
+    """
+    ルートテンプレート（例: /todos/{task_id}/toggle）単位でリクエスト数と処理時間を記録する
+    BaseHTTPMiddleware を使わない純粋なASGIミドルウェア
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = RequestStats(scope)
+        token = current_request_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request_stats.reset(token)
+            route = route_path(scope)
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method, route, status_code)
+            HTTP_LATENCY.observe(elapsed, method, route, status_code)
+            REQUEST_DB_STATEMENTS.observe(stats.db_statements, method, route)
+            REQUEST_DB_SECONDS.observe(stats.db_seconds, method, route)
+            if N_PLUS_ONE_THRESHOLD:
+                report_repeated_statements(stats, method, route)
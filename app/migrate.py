@@ -0,0 +1,37 @@
+"""
+スキーマを最新にする（alembic upgrade head）
+
+    python -m app.migrate
+
+create_all（reset_database.py や benchmarks の投入スクリプト）で作成された alembic_version のないDBは、
+モデルのテーブルがすべてそろっていれば現在の head として記録してから更新する
+（0001 以降のマイグレーションを作成済みのテーブルに適用して失敗しないようにする）
+"""
+import logging
+import os
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
+from app import models  # noqa: F401  モデルをメタデータに登録
+from app.database import Base, engine
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+
+def migrate() -> None:
+    config = Config(ALEMBIC_INI)
+    with engine.connect() as connection:
+        tables = set(inspect(connection).get_table_names())
+    if "alembic_version" not in tables and tables >= set(Base.metadata.tables):
+        logger.info("create_all で作成済みのスキーマを head として記録")
+        command.stamp(config, "head")
+    command.upgrade(config, "head")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    migrate()
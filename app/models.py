@@ -9,21 +9,148 @@ class User(Base):
     username = Column(String, unique=True, index=True)
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String)
+    # タスクが変更されるたびに増える番号（一覧の ETag と差分取得に使う）
+    todo_version = Column(Integer, nullable=False, default=0, server_default="0")
     todos = relationship("Todo", back_populates="user")
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, DDL, ForeignKey, Index, event, literal_column, text
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.sql import func
 
+# SQLiteでは CURRENT_TIMESTAMP が秒単位の文字列で保存されるため、
+# バインド値もマイクロ秒なしの同じ形式にしてカーソル比較を正しく行う
+Timestamp = DateTime().with_variant(sqlite.DATETIME(truncate_microseconds=True), "sqlite")
+
 class Todo(Base):
     __tablename__ = "todos"
+    __table_args__ = (
+        # 一覧取得（user_id で絞り込み、(createdAt, id) 順のキーセット）用
+        Index("ix_todos_user_created_id", "user_id", "createdAt", "id"),
+        # 完了状態での絞り込み用
+        Index("ix_todos_user_completed", "user_id", "completed"),
+        # 差分取得（指定バージョン以降の変更）用
+        Index("ix_todos_user_version", "user_id", "version"),
+        # アーカイブ対象（古い完了済みタスク）の抽出用
+        Index("ix_todos_completed_updated", "completed", "updatedAt"),
+        # 全文検索用（PostgreSQL のみ。SQLite は下の FTS5 テーブルを使う）
+        Index(
+            "ix_todos_search",
+            text("to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(details, ''))"),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
     details = Column(String, nullable=True)
     completed = Column(Boolean, default=False)
-    createdAt = Column(DateTime, default=func.now())  # 作成日時を現在時刻で自動設定
-    updatedAt = Column(DateTime, default=func.now(), onupdate=func.now())
+    createdAt = Column(Timestamp, default=func.now())  # 作成日時を現在時刻で自動設定
+    updatedAt = Column(Timestamp, default=func.now(), onupdate=func.now())
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # 最後に変更されたときの User.todo_version
+    version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Userとのリレーション
     user = relationship("User", back_populates="todos")
+
+# ---- 全文検索 ----
+
+# PostgreSQL：title と details の tsvector（ix_todos_search と同じ式）
+todo_search_vector = func.to_tsvector(
+    literal_column("'simple'"),
+    func.coalesce(Todo.title, literal_column("''"))
+    + literal_column("' '")
+    + func.coalesce(Todo.details, literal_column("''")),
+)
+
+# SQLite：todos を外部コンテンツとする FTS5 テーブルと、同期用のトリガー
+# user_id も索引に含め、MATCH の中でユーザーの絞り込みまで行う
+# alembic/versions/0003_todo_search.py と同じ定義
+SQLITE_FTS_DDL = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS todos_fts USING fts5(
+        title, details, user_id,
+        content='todos', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS todos_fts_ai AFTER INSERT ON todos BEGIN
+        INSERT INTO todos_fts(rowid, title, details, user_id) VALUES (new.id, new.title, new.details, new.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS todos_fts_ad AFTER DELETE ON todos BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, title, details, user_id) VALUES ('delete', old.id, old.title, old.details, old.user_id);
+    END""",
+    # 完了状態の切り替えなどでは再索引しない
+    """CREATE TRIGGER IF NOT EXISTS todos_fts_au AFTER UPDATE OF title, details, user_id ON todos BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, title, details, user_id) VALUES ('delete', old.id, old.title, old.details, old.user_id);
+        INSERT INTO todos_fts(rowid, title, details, user_id) VALUES (new.id, new.title, new.details, new.user_id);
+    END""",
+)
+for _statement in SQLITE_FTS_DDL:
+    event.listen(Todo.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(Todo.__table__, "before_drop", DDL("DROP TABLE IF EXISTS todos_fts").execute_if(dialect="sqlite"))
+
+# 削除されたタスクの記録（差分取得で削除を伝えるため）
+class TodoTombstone(Base):
+    __tablename__ = "todo_tombstones"
+    __table_args__ = (
+        Index("ix_todo_tombstones_user_version", "user_id", "version"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    todo_id = Column(Integer, nullable=False)
+    version = Column(Integer, nullable=False)
+
+# ユーザーごとのタスク件数（タスクを変更するトランザクション内で増減する。crud._adjust_stats を参照）
+# pending は total - completed で求める
+class UserTodoStats(Base):
+    __tablename__ = "user_todo_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total = Column(Integer, nullable=False, default=0, server_default="0")
+    completed = Column(Integer, nullable=False, default=0, server_default="0")
+    archived = Column(Integer, nullable=False, default=0, server_default="0")
+
+# アーカイブされたタスク（古い完了済みタスクを todos から移す。app/archive.py を参照）
+class TodoArchive(Base):
+    __tablename__ = "todos_archive"
+    __table_args__ = (
+        Index("ix_todos_archive_user_created_id", "user_id", "createdAt", "id"),
+    )
+
+    archive_id = Column(Integer, primary_key=True)
+    # 元のタスクID（SQLite では削除後に再利用される場合があるため主キーにしない）
+    id = Column(Integer, nullable=False)
+    title = Column(String)
+    details = Column(String, nullable=True)
+    completed = Column(Boolean, nullable=False)
+    createdAt = Column(Timestamp)
+    updatedAt = Column(Timestamp)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    archivedAt = Column(Timestamp, default=func.now())
+
+# リフレッシュトークン（平文は保存せず SHA-256 のハッシュだけを持つ）
+# 同じログインから発行されたトークンは family_id を共有し、使用済みトークンの再利用を検知したら系列ごと失効させる
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True)
+    token_hash = Column(String(64), nullable=False, unique=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    family_id = Column(String(32), nullable=False, index=True)
+    created_at = Column(Timestamp, default=func.now())
+    expires_at = Column(Timestamp, nullable=False)
+    # ローテーション・ログアウトで失効した日時（有効なトークンは None）
+    revoked_at = Column(Timestamp, nullable=True)
+
+# Idempotency-Key 付きで作成したタスクのレスポンス（IDEMPOTENCY_DB=1 の場合に保存する。app/routes/idempotency.py を参照）
+class IdempotencyRecord(Base):
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    # リクエスト内容の SHA-256（同じキーで異なる内容が送られた場合の検出用）
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=False)
+    response = Column(String, nullable=False)
+    created_at = Column(Timestamp, default=func.now())
+    expires_at = Column(Timestamp, nullable=False, index=True)
@@ -0,0 +1,47 @@
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+# 一覧取得のデフォルト件数と上限
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+# カーソル（createdAt, id）を不透明な文字列にエンコード
+def encode_cursor(created_at: datetime, todo_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), todo_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+# カーソル文字列をデコード（不正な場合は ValueError）
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, todo_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(todo_id)
+    except Exception as e:
+        raise ValueError(f"無効なカーソルです: {cursor}") from e
+
+
+# 検索結果のカーソル（score, id）を不透明な文字列にエンコード
+def encode_search_cursor(score: float, todo_id: int) -> str:
+    raw = json.dumps([score, todo_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+# 検索結果のカーソル文字列をデコード（不正な場合は ValueError）
+def decode_search_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        score, todo_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return float(score), int(todo_id)
+    except Exception as e:
+        raise ValueError(f"無効なカーソルです: {cursor}") from e
+
+
+# タイムゾーン付きの日時をDBと同じ naive UTC に揃える
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
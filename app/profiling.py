@@ -0,0 +1,154 @@
+"""
+リクエスト単位のプロファイリング（任意で有効化）
+PROFILE_TOKEN を設定した上で X-Profile ヘッダーに同じ値を付けたリクエスト、
+または PROFILE_SAMPLE_RATE の割合で抽出したリクエストを cProfile で計測し、PROFILE_DIR に保存する
+
+保存するファイル（<id> はレスポンスの X-Profile-Id ヘッダーと同じ）
+    <id>.prof  pstats 形式（python -m pstats や snakeviz で開ける）
+    <id>.txt   累積時間の上位 PROFILE_TOP_N 件
+
+cProfile はスレッド単位のため、イベントループ上の処理に加えて run_db でスレッドプールに渡した処理も
+別途計測して合算する。同じプロセスで同時に処理中の他のリクエストの処理が含まれる場合があり、
+計測は1プロセスにつき同時に1リクエストまでとする（計測中に届いたリクエストは計測しない）
+DB_ASYNC=1 の場合、run_sync（greenlet）内で実行される crud の処理は cProfile に現れない
+"""
+import cProfile
+import hmac
+import io
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# 計測を要求するヘッダーの値（未設定の場合はヘッダーによる計測は無効）
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+# ヘッダーなしで計測するリクエストの割合（0〜1）
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "40"))
+
+PROFILE_HEADER = b"x-profile"
+
+
+class RequestProfile:
+    """1リクエスト分のプロファイラ（イベントループ上の計測と、スレッドプールでの計測）"""
+
+    def __init__(self):
+        self.id = f"{time.strftime('%Y%m%dT%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        self.main = cProfile.Profile()
+        self.threads: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def add_thread_profile(self, profile: cProfile.Profile) -> None:
+        with self._lock:
+            self.threads.append(profile)
+
+    def stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self.main)
+        for profile in self.threads:
+            stats.add(profile)
+        return stats
+
+
+# 現在のリクエストのプロファイラ（計測対象外のリクエストでは None）
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+
+def profiled(fn):
+    """
+    計測中のリクエストであれば、fn をスレッド内でも計測して合算するように包む
+    （database.run_db がスレッドプールに渡す関数に使う）
+    """
+    profile = current_profile.get()
+    if profile is None:
+        return fn
+
+    def call(*args, **kwargs):
+        thread_profile = cProfile.Profile()
+        try:
+            return thread_profile.runcall(fn, *args, **kwargs)
+        finally:
+            profile.add_thread_profile(thread_profile)
+
+    return call
+
+
+def _write_report(profile: RequestProfile, method: str, route: str, elapsed: float) -> None:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stats = profile.stats()
+    base = os.path.join(PROFILE_DIR, profile.id)
+    stats.dump_stats(base + ".prof")
+
+    buffer = io.StringIO()
+    buffer.write(f"{method} {route} {elapsed * 1000:.1f} ms\n\n")
+    stats.stream = buffer
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+    with open(base + ".txt", "w", encoding="utf-8") as f:
+        f.write(buffer.getvalue())
+
+
+class ProfilingMiddleware:
+    """
+    計測対象のリクエストを cProfile の下で処理し、結果をファイルに保存する純粋なASGIミドルウェア
+    ヘッダーで要求された場合はレスポンスに X-Profile-Id を付ける
+    """
+
+    def __init__(self, app, token: str = PROFILE_TOKEN, sample_rate: float = PROFILE_SAMPLE_RATE):
+        self.app = app
+        self.token = token.encode()
+        self.sample_rate = sample_rate
+        self._active = False
+
+    def _requested(self, scope) -> bool:
+        if not self.token:
+            return False
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return hmac.compare_digest(value, self.token)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        requested = self._requested(scope)
+        if self._active or not (requested or (self.sample_rate > 0 and random.random() < self.sample_rate)):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+
+        async def send_wrapper(message):
+            if requested and message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile.id.encode())]}
+            await send(message)
+
+        self._active = True
+        token = current_profile.set(profile)
+        start = time.perf_counter()
+        profile.main.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.main.disable()
+            elapsed = time.perf_counter() - start
+            current_profile.reset(token)
+            self._active = False
+            route = getattr(scope.get("route"), "path", None) or scope["path"]
+            try:
+                await run_in_threadpool(_write_report, profile, scope["method"], route, elapsed)
+                logger.info("プロファイルを保存", extra={
+                    "profile_id": profile.id, "route": route, "method": scope["method"],
+                    "elapsed_ms": round(elapsed * 1000, 1),
+                })
+            except Exception:
+                logger.exception("プロファイルの保存に失敗", extra={"profile_id": profile.id})
@@ -1,14 +1,26 @@
 # auth.pyを元のシンプルなコードに戻す
+import logging
+import secrets
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
-from jose import JWTError
-from .auth_utils import decode_access_token, verify_password, create_access_token, get_password_hash
-from ..database import get_db
-from sqlalchemy.orm import Session
-from ..models import User
+from .auth_utils import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    REFRESH_TOKEN_ROTATION,
+    InvalidTokenError,
+    create_access_token,
+    decode_access_token,
+    generate_refresh_token,
+    hash_refresh_token,
+    refresh_token_expiry,
+)
+from .auth_cache import CurrentUser, principal_cache
+from .password_pool import BCRYPT_RETRY_AFTER_SECONDS, PasswordPoolBusy, hash_password, verify_and_update_password
+from .. import crud
+from ..database import DbSession, get_session, run_db
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
@@ -16,53 +28,110 @@ class LoginRequest(BaseModel):
     username: str
     password: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 class RegisterRequest(BaseModel):
     username: str
     email: str
     password: str
 
+# bcrypt の待機キューが満杯のときの応答
+def password_pool_busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="現在混み合っています。しばらくしてから再度お試しください",
+        headers={"Retry-After": str(BCRYPT_RETRY_AFTER_SECONDS)},
+    )
+
+# アクセストークンとリフレッシュトークンのレスポンス
+def token_response(username: str, refresh_token: str) -> dict:
+    return {
+        "access_token": create_access_token(data={"sub": username}),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "refresh_token": refresh_token,
+    }
+
+# bcrypt はプロセスプールで実行し、DBアクセスは run_db 経由で実行する
 @router.post("/register")
-def register(request: RegisterRequest, db: Session = Depends(get_db)):
-    print(f"📝 ユーザー登録試行: {request.username}")
+async def register(request: RegisterRequest, db: DbSession = Depends(get_session)):
+    logger.debug("ユーザー登録試行", extra={"username": request.username})
     
     # ユーザー名の重複チェック
-    existing_user = db.query(User).filter(User.username == request.username).first()
+    existing_user = await run_db(db, crud.find_user, username=request.username)
     if existing_user:
-        print(f"❌ ユーザー名が既に存在: {request.username}")
+        logger.info("ユーザー名が既に存在", extra={"username": request.username})
         raise HTTPException(status_code=400, detail="ユーザー名が既に使用されています")
     
     # メールアドレスの重複チェック
-    existing_email = db.query(User).filter(User.email == request.email).first()
+    existing_email = await run_db(db, crud.find_user, email=request.email)
     if existing_email:
-        print(f"❌ メールアドレスが既に存在: {request.email}")
+        logger.info("メールアドレスが既に存在", extra={"username": request.username})
         raise HTTPException(status_code=400, detail="メールアドレスが既に使用されています")
     
     # 新しいユーザーを作成
-    hashed_password = get_password_hash(request.password)
-    new_user = User(
-        username=request.username,
-        email=request.email,
-        hashed_password=hashed_password
-    )
-    
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    try:
+        hashed_password = await hash_password(request.password)
+    except PasswordPoolBusy:
+        raise password_pool_busy_exception()
+    new_user = await run_db(db, crud.create_user, request.username, request.email, hashed_password)
     
-    print(f"✅ ユーザー登録成功: {new_user.username}")
+    logger.info("ユーザー登録成功", extra={"user_id": new_user.id, "username": new_user.username})
     return {"message": "ユーザー登録が完了しました", "username": new_user.username}
 
 @router.post("/login")
-def login(request: LoginRequest, db: Session = Depends(get_db)):
-    print(f"🔐 ログイン試行: {request.username}")
-    user = db.query(User).filter(User.username == request.username).first()
-    if not user or not verify_password(request.password, user.hashed_password):
-        print(f"❌ ログイン失敗: {request.username}")
+async def login(request: LoginRequest, db: DbSession = Depends(get_session)):
+    logger.debug("ログイン試行", extra={"username": request.username})
+    user = await run_db(db, crud.get_user_by_username, request.username)
+    if not user:
+        logger.info("ログイン失敗", extra={"username": request.username})
+        raise HTTPException(status_code=400, detail="ユーザー名またはパスワードが正しくありません")
+
+    try:
+        valid, new_hash = await verify_and_update_password(request.password, user.hashed_password)
+    except PasswordPoolBusy:
+        raise password_pool_busy_exception()
+    if not valid:
+        logger.info("ログイン失敗", extra={"username": request.username})
         raise HTTPException(status_code=400, detail="ユーザー名またはパスワードが正しくありません")
 
-    access_token = create_access_token(data={"sub": user.username})
-    print(f"✅ ログイン成功: {user.username}, トークン生成完了")
-    return {"access_token": access_token, "token_type": "bearer"}
+    # コスト設定の変更などでハッシュが古い場合は再ハッシュして保存
+    if new_hash:
+        await run_db(db, crud.update_password_hash, user, new_hash)
+
+    # ログインごとに新しいリフレッシュトークンの系列を開始する
+    refresh_token, token_hash = generate_refresh_token()
+    await run_db(db, crud.create_refresh_token, user.id, token_hash, secrets.token_hex(16), refresh_token_expiry())
+
+    logger.info("ログイン成功", extra={"user_id": user.id, "username": user.username})
+    return token_response(user.username, refresh_token)
+
+# リフレッシュトークンで新しいアクセストークンを発行（bcrypt を使わずトークンの検索1回で済む）
+@router.post("/refresh")
+async def refresh(request: RefreshRequest, db: DbSession = Depends(get_session)):
+    refresh_token, new_hash = request.refresh_token, None
+    if REFRESH_TOKEN_ROTATION:
+        refresh_token, new_hash = generate_refresh_token()
+    row, reused = await run_db(
+        db, crud.use_refresh_token, hash_refresh_token(request.refresh_token), new_hash, refresh_token_expiry())
+    if row is None:
+        if reused:
+            logger.warning("失効済みのリフレッシュトークンが使用されたため系列を失効")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="リフレッシュトークンが無効です",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    logger.debug("トークン更新", extra={"user_id": row.user_id})
+    return token_response(row.username, refresh_token)
+
+# ログアウト：リフレッシュトークンを系列ごと失効させる（発行済みのアクセストークンは期限まで有効）
+@router.post("/logout")
+async def logout(request: RefreshRequest, db: DbSession = Depends(get_session)):
+    await run_db(db, crud.revoke_refresh_token, hash_refresh_token(request.refresh_token))
+    return {"message": "ログアウトしました"}
 
 # 🔐 JSON方式とヘッダー方式の両方でトークンを取得する関数
 def get_token_from_request(request, authorization: str = None):
@@ -73,26 +142,28 @@ def get_token_from_request(request, authorization: str = None):
     if hasattr(request, 'json') and request.json:
         token = request.json.get('token')
         if token:
-            print(f"🔍 JSONボディからトークンを取得: {token[:20]}...")
+            logger.debug("JSONボディからトークンを取得")
             return token
     
     # 2. Authorizationヘッダーからトークンを取得
     if authorization and authorization.startswith("Bearer "):
         token = authorization[7:]  # "Bearer " を除去
-        print(f"🔍 Authorizationヘッダーからトークンを取得: {token[:20]}...")
+        logger.debug("Authorizationヘッダーからトークンを取得")
         return token
     
-    print("❌ トークンが見つかりません")
+    logger.debug("トークンが見つかりません")
     return None
 
 # 🔐 認証されたユーザー情報を取得する関数（他ルートで利用可能）
-def get_current_user(
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    print(f"🔍 認証チェック開始")
-    print(f"🔍 受信したトークン: {token[:20] + '...' if token and len(token) > 20 else token or '❌ トークンが空です'}")
-    
+    db: DbSession = Depends(get_session)
+) -> CurrentUser:
+    # キャッシュ済みのトークンならDB検索を省略
+    cached_user = principal_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="認証情報が正しくありません",
@@ -100,28 +171,25 @@ def get_current_user(
     )
     
     try:
-        print("🔍 トークンをデコード中...")
         payload = decode_access_token(token)
-        print(f"✅ デコード成功: {payload}")
         
         username: str = payload.get("sub")
         if username is None:
-            print("❌ payloadにsubが含まれていません")
+            logger.info("payloadにsubが含まれていません")
             raise credentials_exception
-        print(f"🔍 ユーザー名: {username}")
-        
-    except JWTError as e:
-        print(f"❌ JWT解析エラー: {str(e)}")
+    except InvalidTokenError as e:
+        logger.info("JWT解析エラー", extra={"error": str(e)})
         raise credentials_exception
     except Exception as e:
-        print(f"❌ 予期しないエラー: {str(e)}")
+        logger.warning("トークン検証中の予期しないエラー", extra={"error": type(e).__name__})
         raise credentials_exception
 
-    print(f"🔍 データベースでユーザー検索: {username}")
-    user = db.query(User).filter(User.username == username).first()
+    user = await run_db(db, crud.get_user_by_username, username)
     if user is None:
-        print(f"❌ ユーザーが見つかりません: {username}")
+        logger.info("ユーザーが見つかりません", extra={"username": username})
         raise credentials_exception
     
-    print(f"✅ 認証成功: {user.username} (ID: {user.id})")
-    return user
\ No newline at end of file
+    logger.debug("認証成功", extra={"user_id": user.id})
+    current_user = CurrentUser.from_user(user)
+    principal_cache.put(token, current_user, payload["exp"])
+    return current_user
\ No newline at end of file
@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import event
+
+from ..metrics import FunctionMetric, registry
+from ..models import User
+
+# キャッシュ設定（環境変数で上書き可能）
+AUTH_CACHE_ENABLED = os.getenv("AUTH_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+AUTH_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", "10000"))
+# トークンの exp より前でも、この秒数が経過したら再検証する
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "300"))
+
+
+# 認証済みユーザーの識別情報（DBセッションに依存しない）
+@dataclass(frozen=True)
+class CurrentUser:
+    id: int
+    username: str
+    email: Optional[str] = None
+
+    @classmethod
+    def from_user(cls, user: User) -> "CurrentUser":
+        return cls(id=user.id, username=user.username, email=user.email)
+
+
+class PrincipalCache:
+    """
+    トークンの署名 → 認証済みユーザーの LRU/TTL キャッシュ
+    エントリはトークンの exp（またはTTL）で失効し、ユーザーの更新・削除時に破棄される
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: int, enabled: bool = True):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # 署名 → (署名対象部分, ユーザー, 失効時刻)
+        self._entries: "OrderedDict[str, Tuple[str, CurrentUser, float]]" = OrderedDict()
+        # ユーザーID → 署名の集合（無効化用）
+        self._by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _split(token: str) -> Optional[Tuple[str, str]]:
+        signing_input, _, signature = token.rpartition(".")
+        if not signing_input or not signature:
+            return None
+        return signing_input, signature
+
+    def get(self, token: str) -> Optional[CurrentUser]:
+        if not self.enabled or not token:
+            return None
+        parts = self._split(token)
+        if parts is None:
+            return None
+        signing_input, signature = parts
+        with self._lock:
+            entry = self._entries.get(signature)
+            # 署名が同じでもヘッダー・ペイロードが異なるトークンは受け付けない
+            if entry is None or entry[0] != signing_input:
+                self.misses += 1
+                return None
+            if entry[2] <= time.time():
+                self._remove(signature)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(signature)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, token: str, user: CurrentUser, expires_at: float) -> None:
+        if not self.enabled:
+            return
+        parts = self._split(token)
+        if parts is None:
+            return
+        signing_input, signature = parts
+        expires_at = min(expires_at, time.time() + self.ttl_seconds)
+        with self._lock:
+            self._remove(signature)
+            self._entries[signature] = (signing_input, user, expires_at)
+            self._by_user.setdefault(user.id, set()).add(signature)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    # 指定ユーザーのエントリをすべて破棄
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            for signature in list(self._by_user.get(user_id, ())):
+                self._remove(signature)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    # ロック取得済みの状態で呼び出すこと
+    def _remove(self, signature: str) -> None:
+        entry = self._entries.pop(signature, None)
+        if entry is None:
+            return
+        signatures = self._by_user.get(entry[1].id)
+        if signatures is not None:
+            signatures.discard(signature)
+            if not signatures:
+                del self._by_user[entry[1].id]
+
+
+principal_cache = PrincipalCache(AUTH_CACHE_MAX_SIZE, AUTH_CACHE_TTL_SECONDS, AUTH_CACHE_ENABLED)
+
+registry.register(FunctionMetric(
+    "auth_cache_hits_total", "認証キャッシュのヒット数", lambda: principal_cache.hits, "counter"))
+registry.register(FunctionMetric(
+    "auth_cache_misses_total", "認証キャッシュのミス数", lambda: principal_cache.misses, "counter"))
+registry.register(FunctionMetric(
+    "auth_cache_entries", "認証キャッシュのエントリ数", lambda: principal_cache.stats()["size"]))
+
+
+# ユーザーが更新・削除されたらキャッシュを破棄
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target: User) -> None:
+    principal_cache.invalidate_user(target.id)
@@ -1,29 +1,62 @@
-from jose import JWTError, jwt  # JWTトークンの生成と検証
-from passlib.context import CryptContext  # パスワードのハッシュ化
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
+import hashlib
+import os
+import secrets
+import time
 
 # セキュリティ設定（本番では環境変数で管理）
 SECRET_KEY = "your_secret_key"
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+# リフレッシュトークンの有効期間（ローテーション時は新しいトークンの期限がこの日数だけ延びる）
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+# 有効にすると /auth/refresh のたびに新しいリフレッシュトークンを発行し、使用したものは失効させる
+REFRESH_TOKEN_ROTATION = os.getenv("REFRESH_TOKEN_ROTATION", "1").lower() not in ("0", "false", "no")
+# bcrypt のコスト（ラウンド数）。変更すると既存ユーザーは次回ログイン時に再ハッシュされる
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
 
-# パスワードハッシュ用コンテキスト
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+class InvalidTokenError(ValueError):
+    """アクセストークンが無効（署名・期限・内容の不備）"""
+
+
+# パスワードハッシュ用コンテキスト（passlib の読み込みは起動を遅くするため、初回の呼び出しで作成する）
+_pwd_context = None
+
+def get_pwd_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+    return _pwd_context
 
 # パスワード検証
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+# パスワードを検証し、コスト変更などで再ハッシュが必要なら新しいハッシュも返す
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return get_pwd_context().verify_and_update(plain_password, hashed_password)
 
 # パスワードをハッシュ化
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+# 関数を実行し、結果と所要時間（秒）を返す（bcrypt ワーカー内での計測用）
+def timed_call(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
 
 # アクセストークンの生成
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     ユーザー情報を含むJWTトークンを作成
     """
+    # jose も読み込みに時間がかかるため、初めて使うときに読み込む
+    from jose import jwt
+
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
@@ -35,12 +68,27 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 # アクセストークンのデコード
 def decode_access_token(token: str) -> dict:
     """
-    JWTトークンを検証して中身（ペイロード）を返す
+    JWTトークンを検証して中身（ペイロード）を返す（無効な場合は InvalidTokenError）
     """
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         if "sub" not in payload:
             raise JWTError("sub がトークンに含まれていません。")
         return payload
     except JWTError as e:
-        raise JWTError(f"無効なトークン: {str(e)}")
+        raise InvalidTokenError(f"無効なトークン: {str(e)}")
+
+# リフレッシュトークンの生成（平文とDB保存用のハッシュを返す）
+def generate_refresh_token() -> Tuple[str, str]:
+    token = secrets.token_urlsafe(32)
+    return token, hash_refresh_token(token)
+
+# リフレッシュトークンのハッシュ（十分にランダムな値なので bcrypt ではなく SHA-256 で照合する）
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+# リフレッシュトークンの有効期限
+def refresh_token_expiry() -> datetime:
+    return datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
@@ -0,0 +1,158 @@
+"""
+Idempotency-Key によるタスク作成の重複防止
+タイムアウトなどで再送された POST /todos・POST /todos/json は、同じユーザー・同じキーの最初の結果をそのまま返す
+（todos テーブルには触れない）。処理中の同じキーのリクエストは、最初のリクエストの完了を待って同じ結果を返す
+
+結果はプロセス内の LRU/TTL ストアに保存し、IDEMPOTENCY_DB=1 の場合は idempotency_keys テーブルにも保存して
+複数プロセス・再起動後も再送を検出する（処理中のリクエストの待ち合わせはプロセス内のみ）
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from .. import crud
+from ..database import DbSession, run_db
+from ..metrics import FunctionMetric, registry
+
+logger = logging.getLogger(__name__)
+
+# 結果を保持する期間（秒）
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# プロセス内に保持する最大件数（超えた分は古いものから破棄）
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+IDEMPOTENCY_DB = os.getenv("IDEMPOTENCY_DB", "0").lower() in ("1", "true", "yes")
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# (ユーザーID, キー)
+StoreKey = Tuple[int, str]
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    fingerprint: str
+    status_code: int
+    body: bytes
+
+
+# リクエスト内容の指紋（キーの順序に依存しない）
+def request_fingerprint(data: dict) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def validate_key(key: str) -> None:
+    if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key は1〜{IDEMPOTENCY_KEY_MAX_LENGTH}文字で指定してください")
+
+
+class IdempotencyStore:
+    """(ユーザーID, キー) → 最初のレスポンス の LRU/TTL ストアと、処理中のキーの待ち合わせ"""
+
+    def __init__(self, max_size: int, ttl_seconds: int, use_db: bool = False):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.use_db = use_db
+        self.replays = 0
+        self.evictions = 0
+        # キー → (レスポンス, 失効時刻)
+        self._entries: "OrderedDict[StoreKey, Tuple[StoredResponse, float]]" = OrderedDict()
+        # 処理中のキー → 完了時に結果が設定される Future
+        self._inflight: Dict[StoreKey, asyncio.Future] = {}
+
+    def get(self, key: StoreKey) -> Optional[StoredResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: StoreKey, response: StoredResponse, expires_at: Optional[float] = None) -> None:
+        self._entries.pop(key, None)
+        self._entries[key] = (response, expires_at or time.time() + self.ttl_seconds)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def size(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def _lookup(self, db: DbSession, key: StoreKey) -> Optional[StoredResponse]:
+        stored = self.get(key)
+        if stored is None and self.use_db:
+            row = await run_db(db, crud.get_idempotency_record, *key)
+            if row is not None:
+                stored = StoredResponse(row.fingerprint, row.status_code, row.response.encode())
+                self.put(key, stored)
+        return stored
+
+    async def run(
+        self,
+        db: DbSession,
+        user_id: int,
+        idempotency_key: str,
+        fingerprint: str,
+        execute: Callable[[], Awaitable[Tuple[int, bytes]]],
+    ) -> Tuple[StoredResponse, bool]:
+        """
+        execute() の結果 (ステータスコード, JSON) を1度だけ求めて保存し、(レスポンス, 再送か) を返す
+        同じキーで異なる内容が送られた場合は 422
+        """
+        key = (user_id, idempotency_key)
+        while True:
+            stored = await self._lookup(db, key)
+            if stored is not None:
+                if stored.fingerprint != fingerprint:
+                    raise HTTPException(status_code=422, detail="同じ Idempotency-Key で異なる内容のリクエストが送られました")
+                self.replays += 1
+                return stored, True
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            # 先に届いたリクエストの完了を待つ（失敗した場合は結果が保存されないため、改めて実行する）
+            await asyncio.shield(inflight)
+
+        done = asyncio.get_running_loop().create_future()
+        self._inflight[key] = done
+        try:
+            status_code, body = await execute()
+            stored = StoredResponse(fingerprint, status_code, body)
+            self.put(key, stored)
+            if self.use_db:
+                await self._save(db, key, stored)
+            return stored, False
+        finally:
+            del self._inflight[key]
+            done.set_result(None)
+
+    # 保存に失敗してもタスクの作成自体は成功しているため、プロセス内のストアだけで続行する
+    async def _save(self, db: DbSession, key: StoreKey, stored: StoredResponse) -> None:
+        expires_at = datetime.utcnow() + timedelta(seconds=self.ttl_seconds)
+        try:
+            await run_db(
+                db, crud.save_idempotency_record, *key,
+                stored.fingerprint, stored.status_code, stored.body.decode(), expires_at,
+            )
+        except Exception:
+            logger.exception("Idempotency-Key の保存に失敗", extra={"user_id": key[0]})
+
+
+idempotency_store = IdempotencyStore(IDEMPOTENCY_MAX_KEYS, IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_DB)
+
+registry.register(FunctionMetric(
+    "idempotency_replays_total", "Idempotency-Key により保存済みの結果を返した回数", lambda: idempotency_store.replays, "counter"))
+registry.register(FunctionMetric(
+    "idempotency_keys", "プロセス内に保持している Idempotency-Key の件数", lambda: idempotency_store.size()))
@@ -0,0 +1,82 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from . import auth_utils
+from ..metrics import BCRYPT_LATENCY, FunctionMetric, registry
+
+# bcrypt 専用ワーカープロセス数（0 の場合はスレッドプールで実行）
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# 実行中＋待機中のハッシュ処理の上限（超えた場合は503を返す）
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", str(max(BCRYPT_WORKERS, 1) * 8)))
+# 503 応答の Retry-After（秒）
+BCRYPT_RETRY_AFTER_SECONDS = int(os.getenv("BCRYPT_RETRY_AFTER_SECONDS", "1"))
+
+
+class PasswordPoolBusy(Exception):
+    """待機キューが満杯でハッシュ処理を受け付けられない"""
+
+
+class PasswordPool:
+    """
+    bcrypt の計算を専用プロセスプールで実行する
+    待機数に上限を設け、リクエスト処理用のスレッドを占有しないようにする
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            # fork だと親プロセスのスレッドやイベントループを引き継ぐため spawn を使う
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def run(self, operation: str, func, *args):
+        if self.pending >= self.max_pending:
+            raise PasswordPoolBusy()
+        self.pending += 1
+        try:
+            if self.workers <= 0:
+                result, elapsed = await run_in_threadpool(auth_utils.timed_call, func, *args)
+            else:
+                loop = asyncio.get_running_loop()
+                result, elapsed = await loop.run_in_executor(
+                    self._get_executor(), auth_utils.timed_call, func, *args
+                )
+        finally:
+            self.pending -= 1
+        # 待機時間を含まない bcrypt 自体の計算時間を記録
+        BCRYPT_LATENCY.observe(elapsed, operation)
+        return result
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_pool = PasswordPool(BCRYPT_WORKERS, BCRYPT_MAX_PENDING)
+
+registry.register(FunctionMetric(
+    "bcrypt_pending", "実行中・待機中の bcrypt 処理数", lambda: password_pool.pending))
+
+
+# パスワードをハッシュ化（ワーカープロセスで実行）
+async def hash_password(password: str) -> str:
+    return await password_pool.run("hash", auth_utils.get_password_hash, password)
+
+
+# パスワードを検証し、ハッシュの更新が必要なら新しいハッシュも返す
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await password_pool.run("verify", auth_utils.verify_and_update_password, plain_password, hashed_password)
@@ -1,13 +1,53 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Header
-from sqlalchemy.orm import Session
-from app.models import Todo, User
-from app.schemas import TodoCreate, TodoResponse
-from app.database import get_db
+import asyncio
+import hashlib
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Header, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.background import BackgroundTask
+from app import crud, events
+from app.events import TodoEvent
+from app.models import Todo, TodoArchive
+from app.write_coalescer import write_coalescer
+from app.serialization import FastJSONResponse, dumps, iter_lines, rows_to_dicts, rows_to_ndjson
+from app.schemas import ArchivedTodoPage, ArchivedTodoResponse, TodoStats, TodoCreate, TodoResponse, TodoPage, TodoChanges, TodoBatchRequest, TodoBatchResponse, TodoImport, TodoImportResult
+from app.database import DbSession, get_session, run_db, stream_rows
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor, encode_search_cursor, decode_search_cursor, to_naive_utc
 from .auth import get_current_user, get_token_from_request, decode_access_token
-from typing import List, Optional
+from .auth_cache import CurrentUser, principal_cache
+from .idempotency import idempotency_store, request_fingerprint, validate_key
+from datetime import datetime
+from typing import List, Optional, Union
 from pydantic import BaseModel
+import os
 
 router = APIRouter(tags=["todos"])
+logger = logging.getLogger(__name__)
+
+# 一括操作で受け付ける最大件数
+TODO_BATCH_MAX_SIZE = int(os.getenv("TODO_BATCH_MAX_SIZE", "500"))
+# エクスポートでDBから一度に取得する行数
+TODO_EXPORT_CHUNK_SIZE = int(os.getenv("TODO_EXPORT_CHUNK_SIZE", "1000"))
+# インポートで1トランザクションにまとめる行数
+TODO_IMPORT_CHUNK_SIZE = int(os.getenv("TODO_IMPORT_CHUNK_SIZE", "1000"))
+# インポートの1行の最大サイズ（バイト）
+TODO_IMPORT_MAX_LINE_BYTES = int(os.getenv("TODO_IMPORT_MAX_LINE_BYTES", "65536"))
+# インポート結果に含めるエラーの最大件数
+TODO_IMPORT_MAX_ERRORS = 100
+# 変更イベントの接続でハートビートを送る間隔（秒）
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+# 切断時にクライアントが再接続するまでの待ち時間（ミリ秒）
+SSE_RETRY_MS = 3000
+
+# 一括操作の種類 → イベントの種類
+BATCH_EVENT_TYPES = {"create": "created", "update": "updated", "toggle": "toggled", "delete": "deleted"}
+
+# ?fields= で指定できる項目と対応する列（並び順は TodoResponse と同じ）
+TODO_FIELDS = {name: getattr(Todo, name) for name in TodoResponse.model_fields}
+# アーカイブ一覧の項目と対応する列
+ARCHIVE_FIELDS = {name: getattr(TodoArchive, name) for name in ArchivedTodoResponse.model_fields}
 
 # JSON方式のリクエスト用スキーマ
 class TodoCreateWithToken(TodoCreate):
@@ -22,131 +62,460 @@ class TodoUpdateWithToken(BaseModel):
 async def get_current_user_json(
     todo_data: TodoCreateWithToken,
     authorization: Optional[str] = Header(None),
-    db: Session = Depends(get_db)
-) -> User:
+    db: DbSession = Depends(get_session)
+) -> CurrentUser:
     """JSON方式またはヘッダー方式でトークンを取得して認証"""
-    print("🔍 JSON方式認証開始")
-    print(f"🔍 受信データ: {todo_data}")
-    
     # JSONボディからトークンを取得
     token = todo_data.token
-    print(f"🔍 JSONからのトークン: {token[:20] + '...' if token else 'None'}")
     
     # ヘッダーからトークンを取得（フォールバック）
     if not token and authorization and authorization.startswith("Bearer "):
         token = authorization[7:]
-        print(f"🔍 Authorizationヘッダーからトークン取得: {token[:20]}...")
+        logger.debug("Authorizationヘッダーからトークン取得")
     
     if not token:
-        print("❌ トークンが見つかりません")
+        logger.debug("トークンが見つかりません")
         raise HTTPException(status_code=401, detail="認証トークンが必要です")
-    
+
+    # キャッシュ済みのトークンならDB検索を省略
+    cached_user = principal_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+
     # トークンを検証
     try:
-        print(f"🔍 トークン検証開始: {token[:30]}...")
         payload = decode_access_token(token)
-        print(f"🔍 デコード結果: {payload}")
         
         username = payload.get("sub")
         if not username:
-            print("❌ payloadにsubが含まれていません")
+            logger.info("payloadにsubが含まれていません")
             raise HTTPException(status_code=401, detail="無効なトークンです")
         
-        print(f"🔍 ユーザー名: {username}")
-        user = db.query(User).filter(User.username == username).first()
+        user = await run_db(db, crud.get_user_by_username, username)
         if not user:
-            print(f"❌ ユーザーが見つかりません: {username}")
+            logger.info("ユーザーが見つかりません", extra={"username": username})
             raise HTTPException(status_code=401, detail="ユーザーが見つかりません")
         
-        print(f"✅ JSON方式認証成功: {user.username}")
-        return user
+        logger.debug("JSON方式認証成功", extra={"user_id": user.id})
+        current_user = CurrentUser.from_user(user)
+        principal_cache.put(token, current_user, payload["exp"])
+        return current_user
     except Exception as e:
-        print(f"❌ JSON方式認証エラー詳細: {type(e).__name__}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.info("JSON方式認証エラー", extra={"error": type(e).__name__})
         raise HTTPException(status_code=401, detail=f"認証に失敗しました: {str(e)}")
 
-# タスク一覧を取得
-@router.get("", response_model=List[TodoResponse])
-def get_todos(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    return db.query(Todo).filter(Todo.user_id == current_user.id).all()
+# 一覧の ETag：ユーザーの変更バージョンとクエリパラメータから作る（todos テーブルは読まない）
+def make_list_etag(user_id: int, version: int, request: Request) -> str:
+    query = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    digest = hashlib.sha256(query.encode()).hexdigest()[:16]
+    return f'"{user_id}.{version}.{digest}"'
+
+# If-None-Match に一致する ETag が含まれるか（弱い比較）
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+# 変更イベントを配信する（コミット後に呼び出す。配信に失敗しても変更自体は成功として扱う）
+async def publish_change(event_type: str, user_id: int, version: int, todo=None, todo_id: Optional[int] = None) -> None:
+    payload = TodoResponse.model_validate(todo).model_dump() if todo is not None else None
+    try:
+        await events.publish(TodoEvent(event_type, user_id, version, payload["id"] if payload else todo_id, payload))
+    except Exception:
+        logger.exception("変更イベントの配信に失敗", extra={"user_id": user_id, "event": event_type})
+
+# タスクを作成する（WRITE_COALESCING=1 の場合は他のリクエストとまとめてコミットする）
+async def create_todo_row(db: DbSession, user_id: int, data: dict):
+    if write_coalescer.enabled:
+        return await write_coalescer.create(user_id, data)
+    return await run_db(db, crud.create_todo, user_id, data)
+
+# タスクを作成して変更イベントを配信する
+async def create_and_publish(db: DbSession, user_id: int, data: dict, error_message: str):
+    try:
+        new_todo = await create_todo_row(db, user_id, data)
+    except Exception:
+        logger.exception(error_message, extra={"user_id": user_id})
+        raise HTTPException(status_code=500, detail="タスクの作成に失敗しました")
+    await publish_change("created", user_id, new_todo.version, new_todo)
+    return new_todo
+
+# Idempotency-Key が指定された場合は、同じキーの最初の結果を返す（再送ではタスクを作成しない）
+async def create_todo_response(db: DbSession, user_id: int, data: dict, idempotency_key: Optional[str], error_message: str):
+    if idempotency_key is None:
+        return await create_and_publish(db, user_id, data, error_message)
+    validate_key(idempotency_key)
+
+    async def execute():
+        new_todo = await create_and_publish(db, user_id, data, error_message)
+        return 200, dumps(TodoResponse.model_validate(new_todo).model_dump())
+
+    stored, replayed = await idempotency_store.run(db, user_id, idempotency_key, request_fingerprint(data), execute)
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    return Response(stored.body, status_code=stored.status_code, media_type="application/json", headers=headers)
+
+# SSE の1イベント分（イベントIDは変更バージョン）
+def format_sse(event: TodoEvent) -> bytes:
+    return f"id: {event.version}\nevent: {event.type}\ndata: ".encode() + dumps(event.to_dict()) + b"\n\n"
+
+# ?fields= を解析する（未指定の場合はすべての項目）
+def parse_fields(fields: Optional[str]) -> List[str]:
+    if not fields:
+        return list(TODO_FIELDS)
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in TODO_FIELDS]
+    if unknown or not names:
+        raise ValueError(f"不明な項目です: {', '.join(unknown)}（指定可能: {', '.join(TODO_FIELDS)}）")
+    # 重複を除き、並び順はレスポンススキーマに合わせる
+    return [name for name in TODO_FIELDS if name in names]
+
+# 一覧のキャッシュ用ヘッダー（ユーザーごとに異なるため共有キャッシュには保存させない）
+def set_cache_headers(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.headers["Vary"] = "Authorization"
+
+# タスク一覧を取得（(createdAt, id) のキーセットページネーション）
+# If-None-Match が現在の ETag と一致する場合は 304 を返す
+# 行ごとの Pydantic 検証を避けるため、必要な列だけをタプルで取得して直接 JSON にする
+@router.get("", response_model=Union[TodoPage, List[TodoResponse]])
+async def get_todos(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="前のページの next_cursor"),
+    completed: Optional[bool] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    updated_after: Optional[datetime] = None,
+    updated_before: Optional[datetime] = None,
+    legacy: bool = Query(False, description="trueの場合は従来通り全件を配列で返す（移行用）"),
+    fields: Optional[str] = Query(None, description="返す項目をカンマ区切りで指定（例: id,title,completed）"),
+    if_none_match: Optional[str] = Header(None),
+    db: DbSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    try:
+        names = parse_fields(fields)
+        decoded_cursor = decode_cursor(cursor) if cursor and not legacy else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # 一覧より先にバージョンを読む（間に書き込みがあっても古い ETag になるだけで取りこぼさない）
+    version = await run_db(db, crud.get_todo_version, current_user.id)
+    etag = make_list_etag(current_user.id, version, request)
+    if etag_matches(if_none_match, etag):
+        not_modified = Response(status_code=304)
+        set_cache_headers(not_modified, etag)
+        return not_modified
+
+    filters = dict(
+        completed=completed,
+        created_after=to_naive_utc(created_after),
+        created_before=to_naive_utc(created_before),
+        updated_after=to_naive_utc(updated_after),
+        updated_before=to_naive_utc(updated_before),
+    )
+
+    # 次ページのカーソルを作るため、末尾に createdAt と id を常に取得する
+    columns = [TODO_FIELDS[name] for name in names] + [Todo.createdAt, Todo.id]
+
+    # レガシーモード：ページネーションなしで全件返す
+    if legacy:
+        rows = await run_db(db, crud.list_todo_rows, current_user.id, columns, **filters)
+        response = FastJSONResponse(rows_to_dicts(rows, names))
+        set_cache_headers(response, etag)
+        return response
+
+    # 1件多く取得して次ページの有無を判定
+    rows = await run_db(
+        db, crud.list_todo_rows, current_user.id, columns, limit=limit + 1, cursor=decoded_cursor, **filters
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-2], rows[-1][-1])
+    response = FastJSONResponse({"items": rows_to_dicts(rows, names), "next_cursor": next_cursor})
+    set_cache_headers(response, etag)
+    return response
+
+# タイトルと詳細を全文検索（関連度順、最後の語は前方一致）
+@router.get("/search", response_model=TodoPage)
+async def search_todos(
+    q: str = Query(..., min_length=1, max_length=200, description="検索語（空白区切りですべてを含むものを検索）"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="前のページの next_cursor"),
+    fields: Optional[str] = Query(None, description="返す項目をカンマ区切りで指定（例: id,title,completed）"),
+    db: DbSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    try:
+        names = parse_fields(fields)
+        decoded_cursor = decode_search_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    terms = crud.parse_search_terms(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="検索語を指定してください")
+
+    # 1件多く取得して次ページの有無を判定（各行の末尾は score と id）
+    rows = await run_db(
+        db, crud.search_todo_rows, current_user.id, [TODO_FIELDS[name] for name in names], terms,
+        limit=limit + 1, cursor=decoded_cursor,
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_search_cursor(rows[-1][-2], rows[-1][-1])
+    return FastJSONResponse({"items": rows_to_dicts(rows, names), "next_cursor": next_cursor})
+
+# 指定バージョンより後の変更（作成・更新・削除）を取得
+@router.get("/changes", response_model=TodoChanges)
+async def get_todo_changes(
+    since: int = Query(0, ge=0, description="前回取得した version"),
+    db: DbSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    version, items, deleted = await run_db(db, crud.list_changes, current_user.id, since)
+    return TodoChanges(version=version, items=items, deleted=deleted)
+
+# タスクの件数（集計済みの値を読むだけで、todos テーブルは数えない）
+@router.get("/stats", response_model=TodoStats)
+async def get_todo_stats(
+    db: DbSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    return await run_db(db, crud.get_todo_stats, current_user.id)
+
+# アーカイブされたタスクを取得（(createdAt, id) のキーセットページネーション）
+@router.get("/archive", response_model=ArchivedTodoPage)
+async def get_archived_todos(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="前のページの next_cursor"),
+    db: DbSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    try:
+        decoded_cursor = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    columns = list(ARCHIVE_FIELDS.values())
+    rows = await run_db(
+        db, crud.list_archived_rows, current_user.id, columns, limit=limit + 1, cursor=decoded_cursor
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].createdAt, rows[-1].id)
+    return FastJSONResponse({"items": rows_to_dicts(rows, list(ARCHIVE_FIELDS)), "next_cursor": next_cursor})
 
 # タスクを作成（ヘッダー方式）
 @router.post("", response_model=TodoResponse)
-def create_todo(
+async def create_todo(
     todo: TodoCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: DbSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None)
 ):
-    print("✅ POST /todos (ヘッダー方式) にアクセスされました")
-    print("受け取ったデータ:", todo)
-    print("現在のユーザー:", current_user.username)
-
-    try:
-        new_todo = Todo(**todo.dict(), user_id=current_user.id)
-        db.add(new_todo)
-        db.commit()
-        db.refresh(new_todo)
-        return new_todo
-    except Exception as e:
-        print("❌ タスク作成中にエラー:", str(e))
-        raise HTTPException(status_code=500, detail="タスクの作成に失敗しました")
+    return await create_todo_response(db, current_user.id, todo.dict(), idempotency_key, "タスク作成中にエラー")
 
 # タスクを作成（JSON方式）
 @router.post("/json", response_model=TodoResponse)
 async def create_todo_json(
     todo_data: TodoCreateWithToken,
-    db: Session = Depends(get_db),
-    authorization: Optional[str] = Header(None)
+    db: DbSession = Depends(get_session),
+    authorization: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None)
 ):
-    print("✅ POST /todos/json (JSON方式) にアクセスされました")
-    print("受け取ったデータ:", todo_data)
-    
     # JSON方式でユーザー認証
     current_user = await get_current_user_json(todo_data, authorization, db)
-    
+
+    # tokenフィールドを除外してTodoを作成
+    todo_dict = todo_data.dict(exclude={'token'})
+    response = await create_todo_response(db, current_user.id, todo_dict, idempotency_key, "JSON方式タスク作成中にエラー")
+    logger.debug("JSON方式でタスク作成成功", extra={"user_id": current_user.id})
+    return response
+
+# 変更イベントを Server-Sent Events で配信（ポーリングの代わりに使う）
+# Last-Event-ID を付けて再接続すると、そのバージョン以降の変更を changed / deleted として先に送る
+@router.get("/events", response_class=StreamingResponse, responses={200: {"content": {"text/event-stream": {}}}})
+async def todo_events(
+    last_event_id: Optional[str] = Header(None),
+    db: DbSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    # 購読を開始してから差分を読むことで、その間の変更も取りこぼさない
+    subscription = await events.event_bus.subscribe(current_user.id)
+    replay = []
+    replayed_version = 0
     try:
-        # tokenフィールドを除外してTodoを作成
-        todo_dict = todo_data.dict(exclude={'token'})
-        new_todo = Todo(**todo_dict, user_id=current_user.id)
-        db.add(new_todo)
-        db.commit()
-        db.refresh(new_todo)
-        print(f"✅ JSON方式でタスク作成成功: {new_todo.title}")
-        return new_todo
-    except Exception as e:
-        print("❌ JSON方式タスク作成中にエラー:", str(e))
-        raise HTTPException(status_code=500, detail="タスクの作成に失敗しました")
+        if last_event_id:
+            try:
+                since = int(last_event_id)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Last-Event-ID が不正です")
+            replayed_version, items, deleted = await run_db(db, crud.list_changes, current_user.id, since)
+            replay = [TodoEvent("deleted", current_user.id, replayed_version, todo_id) for todo_id in deleted]
+            replay += [
+                TodoEvent("changed", current_user.id, replayed_version, todo.id, TodoResponse.model_validate(todo).model_dump())
+                for todo in items
+            ]
+    except BaseException:
+        await events.event_bus.unsubscribe(subscription)
+        raise
+
+    async def stream():
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n".encode()
+            for event in replay:
+                yield format_sse(event)
+            while True:
+                try:
+                    event = await subscription.get(SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                if event is None:
+                    # 配信が追いつかなかった：切断して Last-Event-ID による再同期を促す
+                    yield b"event: reset\ndata: {}\n\n"
+                    break
+                # 再送済みのバージョンは送らない
+                if event.version > replayed_version:
+                    yield format_sse(event)
+        finally:
+            await events.event_bus.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # ストリームが開始されないまま切断された場合も購読を解除する
+        background=BackgroundTask(events.event_bus.unsubscribe, subscription),
+    )
+
+# すべてのタスクを NDJSON でエクスポート（サーバー側カーソルから少しずつ送信する）
+@router.get("/export", response_class=StreamingResponse, responses={200: {"content": {"application/x-ndjson": {}}}})
+async def export_todos(current_user: CurrentUser = Depends(get_current_user)):
+    names = list(TODO_FIELDS)
+    stmt = crud.export_query(current_user.id, [TODO_FIELDS[name] for name in names])
+
+    async def body():
+        async for rows in stream_rows(stmt, TODO_EXPORT_CHUNK_SIZE):
+            yield rows_to_ndjson(rows, names)
+
+    return StreamingResponse(
+        body(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="todos.ndjson"'},
+    )
+
+# NDJSON のタスクをインポート（受信しながら TODO_IMPORT_CHUNK_SIZE 行ずつコミットする）
+# 不正な行はスキップし、行番号とエラー内容を結果に含める
+@router.post("/import", response_model=TodoImportResult)
+async def import_todos(
+    request: Request,
+    db: DbSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    result = {"imported": 0, "failed": 0, "chunks": 0, "errors": []}
+
+    def add_error(line_no: int, error: str) -> None:
+        result["failed"] += 1
+        if len(result["errors"]) < TODO_IMPORT_MAX_ERRORS:
+            result["errors"].append({"line": line_no, "error": error})
+
+    async def flush(pending: list) -> None:
+        try:
+            version = await run_db(db, crud.import_todos, current_user.id, [row for _, row in pending])
+        except SQLAlchemyError as e:
+            for line_no, _ in pending:
+                add_error(line_no, e.__class__.__name__)
+        else:
+            result["imported"] += len(pending)
+            result["chunks"] += 1
+            # 件数が多いため個別のイベントではなく再取得を促すイベントを送る
+            await publish_change("refresh", current_user.id, version)
+        logger.debug("インポート進捗", extra={"user_id": current_user.id, "imported": result["imported"], "failed": result["failed"]})
+
+    pending = []
+    async for line_no, line in iter_lines(request.stream(), TODO_IMPORT_MAX_LINE_BYTES):
+        if line is None:
+            add_error(line_no, f"行が長すぎます（最大 {TODO_IMPORT_MAX_LINE_BYTES} バイト）")
+            continue
+        if not line.strip():
+            continue
+        try:
+            item = TodoImport.model_validate_json(line)
+        except ValidationError as e:
+            error = e.errors(include_url=False)[0]
+            add_error(line_no, f"{'.'.join(map(str, error['loc']))}: {error['msg']}" if error["loc"] else error["msg"])
+            continue
+        row = item.dict(exclude_none=True)
+        for key in ("createdAt", "updatedAt"):
+            if key in row:
+                row[key] = to_naive_utc(row[key])
+        pending.append((line_no, row))
+        if len(pending) >= TODO_IMPORT_CHUNK_SIZE:
+            await flush(pending)
+            pending = []
+    if pending:
+        await flush(pending)
+
+    logger.info("インポート完了", extra={"user_id": current_user.id, "imported": result["imported"], "failed": result["failed"]})
+    return result
+
+# 複数の操作を1トランザクションで一括実行
+@router.post("/batch", response_model=TodoBatchResponse)
+async def batch_todos(
+    request: TodoBatchRequest,
+    db: DbSession = Depends(get_session),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    if len(request.operations) > TODO_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"一括操作は最大 {TODO_BATCH_MAX_SIZE} 件までです",
+        )
+
+    operations = [op.dict(exclude_unset=True) for op in request.operations]
+    results, committed, version = await run_db(db, crud.apply_batch, current_user.id, operations, request.atomic)
+    response = TodoBatchResponse(committed=committed, results=results)
+
+    # atomic モードで失敗した場合は何も反映されていないことを 409 で示す
+    if not committed:
+        return JSONResponse(status_code=409, content=jsonable_encoder(response))
+    for result in results:
+        if result["status"] < 400:
+            await publish_change(BATCH_EVENT_TYPES[result["op"]], current_user.id, version, result["todo"], result["id"])
+    return response
 
 # タスクを更新
 @router.put("/{task_id}", response_model=TodoResponse)
-def update_todo(task_id: int, todo: TodoCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    existing_todo = db.query(Todo).filter(Todo.id == task_id, Todo.user_id == current_user.id).first()
+async def update_todo(task_id: int, todo: TodoCreate, db: DbSession = Depends(get_session), current_user: CurrentUser = Depends(get_current_user)):
+    existing_todo = await run_db(db, crud.update_todo, current_user.id, task_id, todo.dict(exclude_unset=True))
     if not existing_todo:
         raise HTTPException(status_code=404, detail="Todo not found")
-    for key, value in todo.dict(exclude_unset=True).items():
-        setattr(existing_todo, key, value)
-    db.commit()
-    db.refresh(existing_todo)
+    await publish_change("updated", current_user.id, existing_todo.version, existing_todo)
     return existing_todo
 
 # タスクを削除
 @router.delete("/{task_id}")
-def delete_todo(task_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    todo = db.query(Todo).filter(Todo.id == task_id, Todo.user_id == current_user.id).first()
-    if not todo:
+async def delete_todo(task_id: int, db: DbSession = Depends(get_session), current_user: CurrentUser = Depends(get_current_user)):
+    version = await run_db(db, crud.delete_todo, current_user.id, task_id)
+    if version is None:
         raise HTTPException(status_code=404, detail="Todo not found")
-    db.delete(todo)
-    db.commit()
+    await publish_change("deleted", current_user.id, version, todo_id=task_id)
     return {"message": "タスクが削除されました"}
 
 # タスクの完了状態を切り替え
 @router.put("/{task_id}/toggle", response_model=TodoResponse)
-def toggle_task_complete(task_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    task = db.query(Todo).filter(Todo.id == task_id, Todo.user_id == current_user.id).first()
+async def toggle_task_complete(task_id: int, db: DbSession = Depends(get_session), current_user: CurrentUser = Depends(get_current_user)):
+    if write_coalescer.enabled:
+        task = await write_coalescer.toggle(current_user.id, task_id)
+    else:
+        task = await run_db(db, crud.toggle_todo, current_user.id, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Todo not found")
-    task.completed = not task.completed
-    db.commit()
-    db.refresh(task)
+    await publish_change("toggled", current_user.id, task.version, task)
     return task
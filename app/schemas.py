@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, model_validator
+from typing import List, Literal, Optional
 from datetime import datetime
 
 # 基本のタスクスキーマ
@@ -22,6 +22,84 @@ class TodoResponse(TodoBase):
     class Config:
         # ORM（データベースモデル）からデータを読み取る設定
         from_attributes = True
+
+# ページネーション付きのタスク一覧レスポンス
+class TodoPage(BaseModel):
+    items: List[TodoResponse]  # このページのタスク
+    next_cursor: Optional[str] = None  # 次ページ取得用カーソル（最終ページはNone）
+
+# タスクの件数（GET /todos/stats）
+class TodoStats(BaseModel):
+    total: int  # タスク数（アーカイブ済みを除く）
+    completed: int  # 完了済み
+    pending: int  # 未完了
+    archived: int  # アーカイブ済み
+
+# アーカイブされたタスク
+class ArchivedTodoResponse(TodoResponse):
+    archivedAt: datetime  # アーカイブした日時
+
+# ページネーション付きのアーカイブ一覧レスポンス
+class ArchivedTodoPage(BaseModel):
+    items: List[ArchivedTodoResponse]
+    next_cursor: Optional[str] = None
+
+# インポートの1行分（エクスポートした id / user_id などは無視する）
+class TodoImport(TodoBase):
+    completed: bool = False
+    createdAt: Optional[datetime] = None  # 省略時は取り込んだ日時
+    updatedAt: Optional[datetime] = None
+
+# インポート結果
+class TodoImportError(BaseModel):
+    line: int  # 行番号（1始まり）
+    error: str
+
+class TodoImportResult(BaseModel):
+    imported: int  # 追加した件数
+    failed: int  # 取り込めなかった行数
+    chunks: int  # コミットした回数
+    errors: List[TodoImportError]  # エラーの詳細（先頭の一部のみ）
+
+# 差分取得のレスポンス
+class TodoChanges(BaseModel):
+    version: int  # 現在のバージョン（次回の since に指定する）
+    items: List[TodoResponse]  # since より後に作成・更新されたタスク
+    deleted: List[int]  # since より後に削除されたタスクのID
+
+# 一括操作の1件分
+class TodoBatchOperation(BaseModel):
+    op: Literal["create", "update", "toggle", "delete"]  # 操作の種類
+    id: Optional[int] = None  # 対象タスクID（create以外で必須）
+    title: Optional[str] = None  # create では必須、update では任意
+    details: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_required_fields(self):
+        if self.op == "create" and self.title is None:
+            raise ValueError("create には title が必要です")
+        if self.op != "create" and self.id is None:
+            raise ValueError(f"{self.op} には id が必要です")
+        return self
+
+# 一括操作リクエスト
+class TodoBatchRequest(BaseModel):
+    operations: List[TodoBatchOperation]
+    atomic: bool = True  # true: 1件でも失敗したらすべて取り消す / false: 失敗した操作だけ取り消す
+
+# 一括操作の結果（操作ごと）
+class TodoBatchResult(BaseModel):
+    index: int  # リクエスト内の位置
+    op: str
+    id: Optional[int] = None
+    status: int  # HTTPステータス相当（201, 200, 404, 424, 500）
+    todo: Optional[TodoResponse] = None  # create / update / toggle の結果
+    error: Optional[str] = None
+
+# 一括操作レスポンス
+class TodoBatchResponse(BaseModel):
+    committed: bool  # 変更がコミットされたかどうか
+    results: List[TodoBatchResult]
 from pydantic import BaseModel, EmailStr
 
 # ユーザー登録用のスキーマ
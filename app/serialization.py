@@ -0,0 +1,71 @@
+"""
+レスポンスの高速シリアライズ
+件数の多い一覧は Pydantic で1行ずつ検証せず、列のタプルから直接 JSON バイト列を作る
+（response_model は OpenAPI のスキーマ定義のためにそのまま残す）
+"""
+import json
+from datetime import date, datetime
+from typing import AsyncIterator, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # orjson が無い環境では標準の json で出力する
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """orjson（無ければ標準の json）でエンコードする JSONResponse"""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+# 先頭から names の数だけの列を、名前付きの辞書に変換する（残りの列は無視する）
+def rows_to_dicts(rows: Iterable[Sequence], names: Sequence[str]) -> List[dict]:
+    return [dict(zip(names, row)) for row in rows]
+
+
+# 行を NDJSON（1行1オブジェクト）のバイト列にする
+def rows_to_ndjson(rows: Iterable[Sequence], names: Sequence[str]) -> bytes:
+    return b"".join(dumps(dict(zip(names, row))) + b"\n" for row in rows)
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    受信したチャンクを行に分割し、(行番号, 内容) を返す
+    max_line_bytes を超える行は内容を保持せずに読み捨て、内容を None として返す
+    """
+    buffer = b""
+    line_no = 0
+    skipping = False
+    async for chunk in chunks:
+        lines = (buffer + chunk).split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            line_no += 1
+            if skipping or len(line) > max_line_bytes:
+                skipping = False
+                yield line_no, None
+            else:
+                yield line_no, line
+        if len(buffer) > max_line_bytes:
+            skipping = True
+            buffer = b""
+    if buffer or skipping:
+        yield line_no + 1, None if skipping else buffer
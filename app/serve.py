@@ -0,0 +1,131 @@
+"""
+本番用の起動スクリプト（マルチワーカー）
+
+    python -m app.serve --workers 4 --port 8000
+    python -m app.serve --migrate   # 起動前に python -m app.migrate（alembic upgrade head）を1回だけ実行する
+
+既定（--preload）では親プロセスでアプリを読み込んでからワーカーを fork する。
+読み込み済みのモジュールを共有するため、ワーカーの起動が速くメモリ使用量も少ない。
+親プロセスは終了したワーカーを起動し直し、SIGTERM / SIGINT を受けるとすべてのワーカーを停止する。
+fork できない環境（Windows）や --no-preload の場合は uvicorn のマルチプロセス（ワーカーごとに import）で起動する。
+開発時の自動リロードは run_server.py を使う
+"""
+import argparse
+import logging
+import os
+import random
+import signal
+import subprocess
+import sys
+from typing import Dict
+
+import uvicorn
+
+# ワーカー数（uvicorn / gunicorn と同じ環境変数）
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+# fork したワーカーに番号（0 から）を渡す環境変数（定期実行などを1つのワーカーだけで行うために使う）
+WORKER_INDEX_ENV = "WEB_WORKER_INDEX"
+# ワーカーが起動に失敗した場合の終了コード（uvicorn と同じ）
+STARTUP_FAILURE = 3
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+logger = logging.getLogger("uvicorn.error")
+
+
+# スキーマを最新にする（DBに接続した状態でワーカーを fork しないよう、別プロセスで app.migrate を実行する）
+def migrate() -> None:
+    subprocess.run([sys.executable, "-m", "app.migrate"], cwd=ROOT_DIR, check=True)
+
+
+# ワーカーを1つ fork して、子プロセスで uvicorn を実行する（親プロセスには pid を返す）
+def _fork_worker(config: uvicorn.Config, sock, index: int) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+    # 子プロセス：親のシグナルハンドラと乱数の状態を引き継がない
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    random.seed()
+    os.environ[WORKER_INDEX_ENV] = str(index)
+    code = 1
+    try:
+        server = uvicorn.Server(config)
+        server.run(sockets=[sock])
+        code = 0 if server.started else STARTUP_FAILURE
+    finally:
+        os._exit(code)
+
+
+def serve_preloaded(host: str, port: int, workers: int, log_level: str) -> None:
+    from app.main import app
+
+    config = uvicorn.Config(app, host=host, port=port, log_level=log_level)
+    sock = config.bind_socket()
+    # pid → ワーカー番号（起動し直したワーカーは同じ番号を引き継ぐ）
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.info("親プロセス [%d] を起動（ワーカー数 %d、アプリは読み込み済み）", os.getpid(), workers)
+    for index in range(workers):
+        children[_fork_worker(config, sock, index)] = index
+
+    exit_code = 0
+    while children:
+        pid, status = os.wait()
+        index = children.pop(pid, None)
+        code = os.waitstatus_to_exitcode(status)
+        if stopping:
+            continue
+        if code == STARTUP_FAILURE:
+            # 起動に失敗するワーカーは起動し直しても同じ結果になるため、全体を停止する
+            logger.error("ワーカー [%d] の起動に失敗したため停止します", pid)
+            exit_code = STARTUP_FAILURE
+            stop(None, None)
+            continue
+        logger.warning("ワーカー [%d] が終了コード %d で終了したため起動し直します", pid, code)
+        children[_fork_worker(config, sock, index)] = index
+
+    sock.close()
+    logger.info("親プロセス [%d] を停止", os.getpid())
+    sys.exit(exit_code)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY, help="ワーカー数（既定: WEB_CONCURRENCY）")
+    parser.add_argument("--preload", action=argparse.BooleanOptionalAction, default=True,
+                        help="親プロセスでアプリを読み込んでからワーカーを fork する")
+    parser.add_argument("--migrate", action="store_true", help="起動前に python -m app.migrate を実行する")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    os.chdir(ROOT_DIR)
+    if args.migrate:
+        migrate()
+
+    if args.preload and hasattr(os, "fork"):
+        serve_preloaded(args.host, args.port, max(args.workers, 1), args.log_level)
+    else:
+        if args.workers > 1 and int(os.getenv("ARCHIVE_INTERVAL_SECONDS", "0")) > 0:
+            logger.warning("ワーカーを fork しない場合、アーカイブの定期実行はすべてのワーカーで行われます（python -m app.archive の定期実行を推奨）")
+        uvicorn.run(
+            "app.main:create_app", factory=True,
+            host=args.host, port=args.port, workers=args.workers, log_level=args.log_level,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+タスク件数（user_todo_stats）の再集計
+
+    python -m app.stats          # 集計し直して作り直し、ずれのあったユーザーを表示
+    python -m app.stats --check  # 比較だけ行う（ずれがあれば終了コード 1）
+"""
+import argparse
+import json
+import sys
+
+from . import crud
+from .database import SessionLocal
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="作り直さずに比較だけ行う")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        drift = crud.reconcile_todo_stats(db, fix=not args.check)
+    for item in drift:
+        print(json.dumps(item, ensure_ascii=False))
+    print(json.dumps({"drift": len(drift), "fixed": not args.check}, ensure_ascii=False))
+    if args.check and drift:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+書き込みのまとめ実行（グループコミット）
+WRITE_COALESCING=1 のとき、タスクの作成と完了切り替えをバックグラウンドの書き込みタスクに渡し、
+短い時間（または最大件数まで）に届いた複数リクエスト分を1トランザクションでコミットする
+SQLite ではコミットごとに書き込みロックと fsync が発生するため、同時に多数の書き込みがある場合に効果が大きい
+各リクエストには自分の操作の結果（作成・更新後の行）が返る
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+from . import crud
+from .database import run_in_new_session
+from .metrics import FunctionMetric, Histogram, registry
+
+logger = logging.getLogger(__name__)
+
+WRITE_COALESCING = os.getenv("WRITE_COALESCING", "0").lower() in ("1", "true", "yes")
+# 最初の書き込みが届いてから、後続の書き込みを待つ時間（ミリ秒）
+WRITE_COALESCE_WINDOW_MS = float(os.getenv("WRITE_COALESCE_WINDOW_MS", "2"))
+# 1トランザクションにまとめる最大件数
+WRITE_COALESCE_MAX_BATCH = int(os.getenv("WRITE_COALESCE_MAX_BATCH", "200"))
+
+COALESCED_BATCH_SIZE = registry.register(Histogram(
+    "write_coalesce_batch_size", "1トランザクションにまとめた書き込みの件数", (), (1, 2, 5, 10, 20, 50, 100, 200, 500)))
+COALESCED_COMMIT_SECONDS = registry.register(Histogram(
+    "write_coalesce_commit_seconds", "まとめた書き込みの実行時間"))
+
+
+@dataclass
+class PendingWrite:
+    kind: str  # create / toggle
+    user_id: int
+    payload: Any  # create は作成内容の dict、toggle はタスクID
+    future: asyncio.Future = field(repr=False)
+
+
+class WriteCoalescer:
+    """書き込みを受け付けて、まとめてコミットする（プロセス内で1つの書き込みタスクが実行する）"""
+
+    def __init__(self, window_ms: float, max_batch: int, enabled: bool = True):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.enabled = enabled
+        # 書き込み待ちのキュー（None は停止の合図）
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closing = False
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def create(self, user_id: int, data: dict):
+        """タスクを作成し、作成した行を返す"""
+        return await self._submit("create", user_id, data)
+
+    async def toggle(self, user_id: int, todo_id: int):
+        """完了状態を切り替え、更新後の行を返す（該当なしの場合は None）"""
+        return await self._submit("toggle", user_id, todo_id)
+
+    # 書き込みタスクが現在のイベントループで動いているか（テストクライアントなどでループが変わる場合がある）
+    def _running(self) -> bool:
+        return self._task is not None and not self._task.done() and self._loop is asyncio.get_running_loop()
+
+    async def _submit(self, kind: str, user_id: int, payload: Any):
+        if not self._running():
+            self._loop = asyncio.get_running_loop()
+            self._queue = asyncio.Queue()
+            self._closing = False
+            # リクエストのコンテキスト（計測値など）を引き継がないよう、空のコンテキストで開始する
+            self._task = asyncio.create_task(self._run(), context=contextvars.Context())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(PendingWrite(kind, user_id, payload, future))
+        return await future
+
+    async def _collect(self) -> List[PendingWrite]:
+        first = await self._queue.get()
+        if first is None:
+            self._closing = True
+            return []
+        batch = [first]
+        # 前回のコミット中に溜まった分で足りなければ、window の間だけ後続の書き込みを待つ
+        if self.window > 0 and self._queue.qsize() < self.max_batch - 1:
+            await asyncio.sleep(self.window)
+        while len(batch) < self.max_batch and not self._queue.empty():
+            write = self._queue.get_nowait()
+            if write is None:
+                self._closing = True
+                break
+            batch.append(write)
+        return batch
+
+    async def _run(self) -> None:
+        # 停止の合図の後に届いた書き込みも実行してから終了する
+        while not (self._closing and self._queue.empty()):
+            batch = await self._collect()
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch: List[PendingWrite]) -> None:
+        writes = [(write.kind, write.user_id, write.payload) for write in batch]
+        start = time.perf_counter()
+        try:
+            results = await run_in_new_session(crud.apply_coalesced_writes, writes)
+        except Exception as exc:
+            if len(batch) == 1:
+                results = [exc]
+            else:
+                # 1件の失敗で他のリクエストまで失敗させないよう、1件ずつ実行し直す
+                logger.warning("まとめた書き込みに失敗したため個別に再実行", extra={"size": len(batch), "error": type(exc).__name__})
+                results = []
+                for write in writes:
+                    try:
+                        results.extend(await run_in_new_session(crud.apply_coalesced_writes, [write]))
+                    except Exception as write_exc:
+                        results.append(write_exc)
+        COALESCED_BATCH_SIZE.observe(len(batch))
+        COALESCED_COMMIT_SECONDS.observe(time.perf_counter() - start)
+
+        for write, result in zip(batch, results):
+            # 切断などでキャンセルされたリクエストには結果を返さない（書き込み自体は完了している）
+            if write.future.done():
+                continue
+            if isinstance(result, Exception):
+                write.future.set_exception(result)
+            else:
+                write.future.set_result(result)
+
+    async def close(self) -> None:
+        """受け付け済みの書き込みをすべて実行してから書き込みタスクを停止する（終了時に呼び出す）"""
+        if not self._running():
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+
+
+write_coalescer = WriteCoalescer(WRITE_COALESCE_WINDOW_MS, WRITE_COALESCE_MAX_BATCH, WRITE_COALESCING)
+
+registry.register(FunctionMetric(
+    "write_coalesce_pending", "まとめ実行を待っている書き込みの件数", lambda: write_coalescer.pending()))
@@ -0,0 +1,4 @@
+"""
+ベンチマークスクリプト群
+リポジトリのルートから `python -m benchmarks.<name>` で実行します。
+"""
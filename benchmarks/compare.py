@@ -0,0 +1,68 @@
+"""
+負荷テスト結果（benchmarks.load の JSON）の比較
+
+    python -m benchmarks.compare results/base.json results/new.json --threshold 10
+
+エンドポイントごとに p50/p95/p99 とスループットの変化率を表示し、
+p95 の悪化またはスループットの低下が --threshold（%）を超えた場合は終了コード 1 で終了します。
+"""
+import argparse
+import json
+import sys
+from typing import Optional
+
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def change(base: float, new: float) -> Optional[float]:
+    if not base:
+        return None
+    return (new - base) / base * 100
+
+
+def format_change(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:+.1f}%"
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base", help="基準の結果")
+    parser.add_argument("new", help="比較する結果")
+    parser.add_argument("--threshold", type=float, default=10.0, help="回帰とみなす変化率（%%）")
+    args = parser.parse_args()
+
+    base = load(args.base)["endpoints"]
+    new = load(args.new)["endpoints"]
+
+    regressions = []
+    print(f"{'endpoint':<10}{'p50':>10}{'p95':>10}{'p99':>10}{'rps':>10}{'errors':>12}")
+    for name in sorted(base.keys() | new.keys()):
+        if name not in base or name not in new:
+            print(f"{name:<10}  {'基準' if name not in base else '比較対象'}の結果にありません")
+            continue
+        b, n = base[name], new[name]
+        latency = [change(b[key], n[key]) for key in LATENCY_KEYS]
+        rps = change(b["throughput_rps"], n["throughput_rps"])
+        print(
+            f"{name:<10}" + "".join(f"{format_change(value):>10}" for value in latency)
+            + f"{format_change(rps):>10}{b['errors']:>6}->{n['errors']:<5}"
+        )
+        if latency[1] is not None and latency[1] > args.threshold:
+            regressions.append(f"{name}: p95 {b['p95_ms']} -> {n['p95_ms']} ms")
+        if rps is not None and rps < -args.threshold:
+            regressions.append(f"{name}: throughput {b['throughput_rps']} -> {n['throughput_rps']} req/s")
+
+    if regressions:
+        print(f"\n{args.threshold}% を超える悪化があります:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+todos テーブルの複合インデックス有無による一覧取得・検索レイテンシの比較
+
+    python -m benchmarks.index_bench --rows 1000000 --users 1000
+
+一時ファイルのSQLiteにデータを投入し、インデックス追加前後で
+GET /todos 相当のクエリの所要時間を計測します。
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+
+from app.database import Base
+from app.models import Todo
+
+# alembic/versions/0001_todo_indexes.py で追加したインデックス
+NEW_INDEXES = ("ix_todos_user_created_id", "ix_todos_user_completed")
+
+QUERIES = {
+    # 一覧の1ページ目（キーセットページネーション）
+    "list_page": text(
+        'SELECT * FROM todos WHERE user_id = :uid ORDER BY "createdAt", id LIMIT 50'
+    ),
+    # 所有者チェック付きの1件取得（toggle / update / delete）
+    "lookup": text("SELECT * FROM todos WHERE id = :tid AND user_id = :uid"),
+    # 完了済みタスクの絞り込み
+    "completed_filter": text(
+        "SELECT * FROM todos WHERE user_id = :uid AND completed = 1 LIMIT 50"
+    ),
+}
+
+
+# ユーザーとタスクを一括投入
+def seed(engine, rows: int, users: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO users (id, username, email, hashed_password) VALUES (:id, :u, :e, 'x')"),
+            [{"id": i, "u": f"user{i}", "e": f"user{i}@example.com"} for i in range(1, users + 1)],
+        )
+        chunk = 50_000
+        for start in range(0, rows, chunk):
+            conn.execute(
+                text(
+                    'INSERT INTO todos (title, details, completed, "createdAt", "updatedAt", user_id) '
+                    "VALUES (:t, NULL, :c, datetime('now', :off), datetime('now', :off), :uid)"
+                ),
+                [
+                    {
+                        "t": f"todo {i}",
+                        "c": i % 3 == 0,
+                        "off": f"-{rows - i} seconds",
+                        "uid": random.randint(1, users),
+                    }
+                    for i in range(start, min(start + chunk, rows))
+                ],
+            )
+
+
+# 各クエリを繰り返し実行し、レイテンシ（ミリ秒）の中央値とp95を返す
+def measure(engine, rows: int, users: int, iterations: int) -> dict:
+    results = {}
+    with engine.connect() as conn:
+        for name, query in QUERIES.items():
+            samples = []
+            for _ in range(iterations):
+                params = {"uid": random.randint(1, users), "tid": random.randint(1, rows)}
+                start = time.perf_counter()
+                conn.execute(query, params).fetchall()
+                samples.append((time.perf_counter() - start) * 1000)
+            samples.sort()
+            results[name] = {
+                "p50_ms": round(statistics.median(samples), 3),
+                "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+            }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(0)
+    path = os.path.join(tempfile.mkdtemp(), "index_bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+
+    # インデックス追加前の状態を再現
+    with engine.begin() as conn:
+        for name in NEW_INDEXES:
+            conn.execute(text(f"DROP INDEX {name}"))
+
+    print(f"📦 {args.rows:,} 件のタスクを投入中（ユーザー数 {args.users:,}）...")
+    seed(engine, args.rows, args.users)
+
+    before = measure(engine, args.rows, args.users, args.iterations)
+
+    with engine.begin() as conn:
+        for index in Todo.__table__.indexes:
+            if index.name in NEW_INDEXES:
+                index.create(conn)
+        conn.execute(text("ANALYZE"))
+
+    after = measure(engine, args.rows, args.users, args.iterations)
+
+    print(f"{'query':<18}{'before p50':>12}{'before p95':>12}{'after p50':>12}{'after p95':>12}")
+    for name in QUERIES:
+        b, a = before[name], after[name]
+        print(f"{name:<18}{b['p50_ms']:>12}{b['p95_ms']:>12}{a['p50_ms']:>12}{a['p95_ms']:>12}")
+
+    engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
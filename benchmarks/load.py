@@ -0,0 +1,248 @@
+"""
+APIの負荷テスト（非同期の負荷生成）
+
+    python -m benchmarks.seed --users 50 --todos 200 --reset
+    python -m benchmarks.load --users 50 --concurrency 20 --duration 30 --output results/base.json
+    python -m benchmarks.load --base-url http://localhost:8000 --concurrency 50 --duration 60
+
+--base-url を省略するとアプリをプロセス内で動かし（httpx.ASGITransport）、
+指定すると起動済みのサーバー（uvicorn など）に接続します。
+各ワーカーは benchmarks.seed で作成したユーザーでログインし、--mix の比率で
+一覧・作成・完了切り替え・更新・削除・ログインを繰り返します。
+エンドポイントごとの p50/p95/p99 とスループットを表示し、--output を指定すると JSON で保存します
+（benchmarks.compare で比較できます）。
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import statistics
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.seed import DEFAULT_PASSWORD, username
+
+DEFAULT_MIX = "list=40,create=15,toggle=20,update=15,delete=8,login=2"
+# 一覧取得の件数（ワーカー開始時に操作対象のタスクIDを集めるのにも使う）
+LIST_LIMIT = 50
+# ログインが 503 で拒否された場合の最大試行回数
+LOGIN_RETRIES = 10
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, weight = item.partition("=")
+        if name not in ("list", "create", "toggle", "update", "delete", "login"):
+            raise SystemExit(f"不明な操作です: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+# 昇順に並んだサンプルのパーセンタイル（最近傍順位法）
+def percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    rank = min(max(math.ceil(q / 100 * len(samples)), 1), len(samples))
+    return samples[rank - 1]
+
+
+class Recorder:
+    """エンドポイントごとのレイテンシ（ミリ秒）とステータスコードを記録する"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    def reset(self) -> None:
+        self.latencies.clear()
+        self.statuses.clear()
+
+    def record(self, name: str, elapsed: float, status: int) -> None:
+        self.statuses[name][status] += 1
+        if status < 400:
+            self.latencies[name].append(elapsed * 1000)
+
+    def summary(self, duration: float) -> dict:
+        endpoints = {}
+        for name in sorted(self.statuses):
+            samples = sorted(self.latencies[name])
+            requests = sum(self.statuses[name].values())
+            endpoints[name] = {
+                "requests": requests,
+                "errors": requests - len(samples),
+                "throughput_rps": round(len(samples) / duration, 2),
+                "p50_ms": round(percentile(samples, 50), 3),
+                "p95_ms": round(percentile(samples, 95), 3),
+                "p99_ms": round(percentile(samples, 99), 3),
+                "mean_ms": round(statistics.fmean(samples), 3) if samples else 0.0,
+                "max_ms": round(samples[-1], 3) if samples else 0.0,
+                "status": {str(code): count for code, count in sorted(self.statuses[name].items())},
+            }
+        total_requests = sum(e["requests"] for e in endpoints.values())
+        total_errors = sum(e["errors"] for e in endpoints.values())
+        return {
+            "endpoints": endpoints,
+            "total": {
+                "requests": total_requests,
+                "errors": total_errors,
+                "throughput_rps": round((total_requests - total_errors) / duration, 2),
+            },
+        }
+
+
+async def timed(recorder: Recorder, name: str, client: httpx.AsyncClient, method: str, url: str, **kwargs) -> httpx.Response:
+    start = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    recorder.record(name, time.perf_counter() - start, response.status_code)
+    return response
+
+
+async def login(recorder: Recorder, client: httpx.AsyncClient, user: str, password: str) -> dict:
+    # bcrypt の待機キューが満杯の場合（503）は Retry-After だけ待って再試行する
+    for _ in range(LOGIN_RETRIES):
+        response = await timed(recorder, "login", client, "POST", "/auth/login", json={"username": user, "password": password})
+        if response.status_code != 503:
+            break
+        await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class Worker:
+    """1接続分の負荷生成（ログインと操作対象のID取得は計測時間の前に済ませる）"""
+
+    def __init__(self, worker_id: int, client: httpx.AsyncClient, recorder: Recorder, args, mix: Dict[str, float]):
+        self.client = client
+        self.recorder = recorder
+        self.password = args.password
+        self.user = username(worker_id % args.users + 1)
+        self.rng = random.Random(args.seed * 100_003 + worker_id)
+        self.names = list(mix)
+        self.cum_weights = list(itertools.accumulate(mix.values()))
+        self.headers: dict = {}
+        self.ids: List[int] = []
+
+    async def prepare(self, todo_ids: Dict[str, List[int]]) -> None:
+        self.headers = await login(self.recorder, self.client, self.user, self.password)
+        # 同じユーザーのワーカー間で操作対象のタスクIDを共有する
+        ids = todo_ids.get(self.user)
+        if ids is None:
+            ids = todo_ids[self.user] = []
+            response = await self.client.get("/todos", params={"limit": LIST_LIMIT}, headers=self.headers)
+            response.raise_for_status()
+            ids.extend(item["id"] for item in response.json()["items"])
+        self.ids = ids
+
+    async def run(self, deadline: float) -> None:
+        rng, ids, client, recorder = self.rng, self.ids, self.client, self.recorder
+        while time.perf_counter() < deadline:
+            op = rng.choices(self.names, cum_weights=self.cum_weights)[0]
+            if op in ("toggle", "update", "delete") and not ids:
+                op = "create"
+
+            if op == "list":
+                await timed(recorder, op, client, "GET", "/todos", params={"limit": LIST_LIMIT}, headers=self.headers)
+            elif op == "create":
+                response = await timed(
+                    recorder, op, client, "POST", "/todos", json={"title": f"load {rng.random():.6f}"}, headers=self.headers)
+                if response.status_code < 400:
+                    ids.append(response.json()["id"])
+            elif op == "toggle":
+                await timed(recorder, op, client, "PUT", f"/todos/{rng.choice(ids)}/toggle", headers=self.headers)
+            elif op == "update":
+                await timed(
+                    recorder, op, client, "PUT", f"/todos/{rng.choice(ids)}",
+                    json={"title": f"updated {rng.random():.6f}"}, headers=self.headers)
+            elif op == "delete":
+                # 他のワーカーが選ばないよう、先に一覧から外す
+                todo_id = ids.pop(rng.randrange(len(ids)))
+                await timed(recorder, op, client, "DELETE", f"/todos/{todo_id}", headers=self.headers)
+            elif op == "login":
+                self.headers = await login(recorder, client, self.user, self.password)
+
+
+async def run(args) -> dict:
+    mix = parse_mix(args.mix)
+    recorder = Recorder()
+    todo_ids: Dict[str, List[int]] = {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async def drive(client: httpx.AsyncClient) -> float:
+        workers = [Worker(i, client, recorder, args, mix) for i in range(args.concurrency)]
+        await asyncio.gather(*(w.prepare(todo_ids) for w in workers))
+        # 準備中のログインは集計に含めない
+        recorder.reset()
+        start = time.perf_counter()
+        await asyncio.gather(*(w.run(start + args.duration) for w in workers))
+        return time.perf_counter() - start
+
+    started_at = datetime.now(timezone.utc).isoformat()
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+            duration = await drive(client)
+    else:
+        from app.main import app
+
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+                duration = await drive(client)
+
+    return {
+        "meta": {
+            "target": args.base_url or "in-process",
+            "started_at": started_at,
+            "duration_s": round(duration, 3),
+            "concurrency": args.concurrency,
+            "users": args.users,
+            "mix": mix,
+            "seed": args.seed,
+        },
+        **recorder.summary(duration),
+    }
+
+
+def print_summary(result: dict) -> None:
+    meta = result["meta"]
+    print(f"target={meta['target']} concurrency={meta['concurrency']} duration={meta['duration_s']}s")
+    print(f"{'endpoint':<10}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, e in result["endpoints"].items():
+        print(
+            f"{name:<10}{e['requests']:>10}{e['errors']:>8}{e['throughput_rps']:>10}"
+            f"{e['p50_ms']:>10}{e['p95_ms']:>10}{e['p99_ms']:>10}"
+        )
+    total = result["total"]
+    print(f"{'total':<10}{total['requests']:>10}{total['errors']:>8}{total['throughput_rps']:>10}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="接続先（省略時はプロセス内で実行）")
+    parser.add_argument("--users", type=int, default=10, help="benchmarks.seed で作成したユーザー数")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10.0, help="実行時間（秒）")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"操作の比率（既定: {DEFAULT_MIX}）")
+    parser.add_argument("--seed", type=int, default=0, help="乱数のシード")
+    parser.add_argument("--timeout", type=float, default=30.0, help="リクエストのタイムアウト（秒）")
+    parser.add_argument("--output", help="結果を保存する JSON ファイル")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_summary(result)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
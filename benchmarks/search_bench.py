@@ -0,0 +1,133 @@
+"""
+タスクの全文検索（GET /todos/search）のレイテンシ比較
+
+    python -m benchmarks.search_bench --rows 1000000 --users 1000
+
+一時ファイルのSQLiteにデータを投入し、同じ検索語で次の3つを比較します。
+- client: ユーザーの全タスクを取得してアプリ側で絞り込む（従来のクライアント側検索）
+- like:   user_id で絞り込んだうえで title / details に LIKE '%語%'
+- fts:    crud.search_todo_rows（FTS5 + bm25 の関連度順、前方一致）
+
+タスクの語は頻度が順位に反比例する分布で生成し、検索語は語彙から一様に選びます。
+ほぼすべてのタスクに含まれる頻出語の前方一致は、この結果より大幅に遅くなります。
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, or_, text
+from sqlalchemy.orm import sessionmaker
+
+from app import crud
+from app.database import Base
+from app.models import SQLITE_FTS_DDL, Todo
+
+# 語彙（出現頻度が順位に反比例するよう重み付けして使う）
+_rng = random.Random(42)
+WORDS = [
+    "".join(_rng.choice("bcdfghjklmnprstvwz") + _rng.choice("aeiou") for _ in range(_rng.randint(2, 4)))
+    for _ in range(5000)
+] + "買い物 牛乳 掃除 洗濯 会議 資料 請求書 予約 支払い 提出".split()
+CUM_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(WORDS))))
+PAGE_SIZE = 50
+
+
+def sentence(rng: random.Random, length: int) -> str:
+    return " ".join(rng.choices(WORDS, cum_weights=CUM_WEIGHTS, k=length))
+
+
+# ユーザーとタスクを一括投入
+# 1行ずつトリガーで索引するより速いため、投入中は INSERT トリガーを外して最後に索引を作り直す
+def seed(engine, rows: int, users: int) -> None:
+    rng = random.Random(0)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TRIGGER todos_fts_ai"))
+        conn.execute(
+            text("INSERT INTO users (id, username, email, hashed_password) VALUES (:id, :u, :e, 'x')"),
+            [{"id": i, "u": f"user{i}", "e": f"user{i}@example.com"} for i in range(1, users + 1)],
+        )
+        chunk = 50_000
+        for start in range(0, rows, chunk):
+            conn.execute(
+                text("INSERT INTO todos (title, details, completed, user_id, version) VALUES (:t, :d, 0, :uid, 1)"),
+                [
+                    {"t": sentence(rng, 3), "d": sentence(rng, 12), "uid": rng.randint(1, users)}
+                    for _ in range(start, min(start + chunk, rows))
+                ],
+            )
+        conn.execute(text("INSERT INTO todos_fts(todos_fts) VALUES ('rebuild')"))
+        conn.execute(text(SQLITE_FTS_DDL[1]))
+
+
+def client_side(db, user_id: int, word: str):
+    todos = crud.list_todos(db, user_id)
+    return [t for t in todos if word in (t.title or "") or word in (t.details or "")][:PAGE_SIZE]
+
+
+def like(db, user_id: int, word: str):
+    pattern = f"%{word}%"
+    return (
+        db.query(Todo)
+        .filter(Todo.user_id == user_id, or_(Todo.title.like(pattern), Todo.details.like(pattern)))
+        .limit(PAGE_SIZE)
+        .all()
+    )
+
+
+def fts(db, user_id: int, word: str):
+    return crud.search_todo_rows(db, user_id, crud.TODO_COLUMNS, [word], limit=PAGE_SIZE)
+
+
+def measure(Session, func, users: int, iterations: int) -> dict:
+    rng = random.Random(1)
+    samples = []
+    db = Session()
+    for _ in range(iterations):
+        user_id, word = rng.randint(1, users), rng.choice(WORDS)
+        start = time.perf_counter()
+        func(db, user_id, word)
+        samples.append((time.perf_counter() - start) * 1000)
+        db.expunge_all()
+    db.close()
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "search_bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    print(f"{args.rows:,} 件のタスクを投入中（ユーザー数 {args.users:,}）...")
+    start = time.perf_counter()
+    seed(engine, args.rows, args.users)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO todos_fts(todos_fts) VALUES ('optimize')"))
+        conn.execute(text("ANALYZE"))
+    print(f"投入完了 {time.perf_counter() - start:.0f} 秒")
+
+    print(f"{'method':<10}{'p50 ms':>12}{'p95 ms':>12}")
+    for name, func in (("client", client_side), ("like", like), ("fts", fts)):
+        result = measure(Session, func, args.users, args.iterations)
+        print(f"{name:<10}{result['p50_ms']:>12}{result['p95_ms']:>12}")
+
+    engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
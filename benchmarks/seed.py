@@ -0,0 +1,99 @@
+"""
+ベンチマーク・負荷テスト用のデータ投入
+
+    python -m benchmarks.seed --users 100 --todos 1000 --reset
+
+ユーザー bench1〜benchN（パスワード共通）と、各ユーザーに M 件のタスクを一括投入します。
+bcrypt のハッシュは1回だけ計算して全ユーザーで使い回します。
+投入先は DATABASE_URL（未設定の場合は ./todo_app.db）です。--reset を付けると既存のテーブルを削除して作り直します。
+"""
+import argparse
+import random
+import time
+
+from sqlalchemy import insert
+
+from app.database import Base, engine
+from app.models import Todo, User, UserTodoStats
+from app.routes import auth_utils
+
+USERNAME_PREFIX = "bench"
+DEFAULT_PASSWORD = "benchpass"
+CHUNK_SIZE = 10_000
+
+
+def username(index: int) -> str:
+    return f"{USERNAME_PREFIX}{index}"
+
+
+def seed(bind, users: int, todos_per_user: int, password: str = DEFAULT_PASSWORD, seed_value: int = 0) -> dict:
+    """ユーザーとタスクを一括投入し、件数と所要時間を返す"""
+    rng = random.Random(seed_value)
+    start = time.perf_counter()
+    hashed_password = auth_utils.get_password_hash(password)
+
+    with bind.begin() as conn:
+        user_ids = conn.execute(
+            insert(User).returning(User.id, sort_by_parameter_order=True),
+            [
+                {
+                    "username": username(i),
+                    "email": f"{username(i)}@example.com",
+                    "hashed_password": hashed_password,
+                    # タスクを1件ずつ作成した場合と同じバージョンにする
+                    "todo_version": todos_per_user,
+                }
+                for i in range(1, users + 1)
+            ],
+        ).scalars().all()
+
+        batch, stats = [], []
+        for user_id in user_ids:
+            completed = 0
+            for j in range(todos_per_user):
+                details = f"benchmark task {j} of user {user_id}" if rng.random() < 0.5 else None
+                done = rng.random() < 0.3
+                completed += done
+                batch.append({
+                    "title": f"task {j}",
+                    "details": details,
+                    "completed": done,
+                    "user_id": user_id,
+                    "version": j + 1,
+                })
+                if len(batch) >= CHUNK_SIZE:
+                    conn.execute(insert(Todo), batch)
+                    batch = []
+            stats.append({"user_id": user_id, "total": todos_per_user, "completed": completed, "archived": 0})
+        if batch:
+            conn.execute(insert(Todo), batch)
+        # タスクの件数（通常は作成・削除のたびに更新される）
+        conn.execute(insert(UserTodoStats), stats)
+
+    return {
+        "users": len(user_ids),
+        "todos": len(user_ids) * todos_per_user,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--todos", type=int, default=100, help="ユーザーごとのタスク数")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD)
+    parser.add_argument("--seed", type=int, default=0, help="乱数のシード")
+    parser.add_argument("--reset", action="store_true", help="既存のテーブルを削除して作り直す")
+    args = parser.parse_args()
+
+    if args.reset:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    result = seed(engine, args.users, args.todos, args.password, args.seed)
+    rate = result["todos"] / result["seconds"] if result["seconds"] else 0
+    print(f"users={result['users']:,} todos={result['todos']:,} seconds={result['seconds']} ({rate:,.0f} todos/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+タスク一覧のシリアライズ方式の比較（レイテンシとピークメモリ）
+
+    python -m benchmarks.serialize_bench --rows 10000 --repeat 20
+
+従来の「ORM オブジェクト → response_model で1行ずつ検証 → JSONResponse」と、
+GET /todos の「列のタプル → FastJSONResponse」を、DBからの取得を含めて比較します。
+ピークメモリは tracemalloc で計測します。
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import crud
+from app.database import Base
+from app.models import Todo, User
+from app.routes.todos import TODO_FIELDS
+from app.schemas import TodoResponse
+from app.serialization import FastJSONResponse, orjson, rows_to_dicts
+
+RESPONSE_FIELD = create_model_field("Response", List[TodoResponse], mode="serialization")
+
+
+# 変更前の GET /todos?legacy=true と同じ処理（FastAPI が response_model で検証してからエンコード）
+def pydantic_path(db, user_id: int) -> bytes:
+    todos = crud.list_todos(db, user_id)
+    content = asyncio.run(serialize_response(field=RESPONSE_FIELD, response_content=todos))
+    return JSONResponse(content).body
+
+
+def fast_path(db, user_id: int) -> bytes:
+    names = list(TODO_FIELDS)
+    columns = [TODO_FIELDS[name] for name in names]
+    rows = crud.list_todo_rows(db, user_id, columns)
+    return FastJSONResponse(rows_to_dicts(rows, names)).body
+
+
+def measure(path, Session, user_id: int, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        db = Session()
+        start = time.perf_counter()
+        body = path(db, user_id)
+        timings.append((time.perf_counter() - start) * 1000)
+        db.close()
+
+    db = Session()
+    tracemalloc.start()
+    path(db, user_id)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.close()
+    return timings, peak, body
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "serialize_bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    db = Session()
+    user = User(username="bench", email="bench@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    db.execute(insert(Todo), [
+        {"title": f"task {i}", "details": "詳細" * 10, "completed": i % 3 == 0, "user_id": user_id}
+        for i in range(args.rows)
+    ])
+    db.commit()
+    db.close()
+
+    print(f"rows={args.rows} encoder={'orjson' if orjson else 'json'}")
+    bodies = {}
+    for name, func in (("pydantic", pydantic_path), ("fast", fast_path)):
+        timings, peak, bodies[name] = measure(func, Session, user_id, args.repeat)
+        print(
+            f"{name:<10} p50={statistics.median(timings):8.1f} ms  "
+            f"min={min(timings):8.1f} ms  peak={peak / 1024 / 1024:6.1f} MiB  "
+            f"body={len(bodies[name]) / 1024:.0f} KiB"
+        )
+    print(f"same_body={bodies['pydantic'] == bodies['fast']}")
+
+    engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
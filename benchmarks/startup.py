@@ -0,0 +1,122 @@
+"""
+アプリの起動時間の計測（CI 用）
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --runs 5 --max-import-ms 1500 --max-first-request-ms 200 --output results/startup.json
+
+計測ごとに新しいプロセスを起動し、次の時間を測ります（中央値と最大値を表示）。
+    import         app.main の import（アプリの作成を含む）
+    startup        lifespan の起動処理
+    first_request  最初のリクエスト（--path）のレイテンシ
+--max-* を超えた場合（中央値）は終了コード 1 で終了します。
+--importtime を指定すると、python -X importtime で import に時間のかかったモジュールを表示します。
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PHASES = ("import", "startup", "first_request")
+
+
+# 子プロセスで1回分を計測する（結果は標準出力の最後の行に JSON で出力）
+def measure_once(path: str) -> dict:
+    start = time.perf_counter()
+    from app.main import app
+    imported = time.perf_counter()
+
+    import httpx
+
+    async def run() -> dict:
+        async with app.router.lifespan_context(app):
+            started = time.perf_counter()
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+                response = await client.get(path)
+            finished = time.perf_counter()
+            return {"started": started, "finished": finished, "status": response.status_code}
+
+    startup_begin = time.perf_counter()
+    result = asyncio.run(run())
+    return {
+        "import": (imported - start) * 1000,
+        "startup": (result["started"] - startup_begin) * 1000,
+        "first_request": (result["finished"] - result["started"]) * 1000,
+        "status": result["status"],
+    }
+
+
+def run_child(path: str) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child", "--path", path],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+# python -X importtime の出力から、累積時間の長いモジュールを返す
+def slowest_imports(top: int) -> list:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"], capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            modules.append((int(cumulative) / 1000, name.strip()))
+    return sorted(modules, reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/metrics", help="最初に送るリクエストのパス")
+    parser.add_argument("--max-import-ms", type=float, help="import の中央値の上限")
+    parser.add_argument("--max-first-request-ms", type=float, help="最初のリクエストの中央値の上限")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N", help="import に時間のかかったモジュールを N 件表示")
+    parser.add_argument("--output", help="結果を保存する JSON ファイル")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_once(args.path)))
+        return
+
+    samples = [run_child(args.path) for _ in range(args.runs)]
+    result = {"runs": args.runs, "path": args.path, "status": samples[-1]["status"]}
+    print(f"{'phase':<15}{'median ms':>12}{'max ms':>12}")
+    for phase in PHASES:
+        values = [sample[phase] for sample in samples]
+        result[phase] = {"median_ms": round(statistics.median(values), 1), "max_ms": round(max(values), 1)}
+        print(f"{phase:<15}{result[phase]['median_ms']:>12}{result[phase]['max_ms']:>12}")
+
+    if args.importtime:
+        print(f"\n{'cumulative ms':>14}  module")
+        for elapsed, name in slowest_imports(args.importtime):
+            print(f"{elapsed:>14.1f}  {name}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    failures = []
+    if args.max_import_ms is not None and result["import"]["median_ms"] > args.max_import_ms:
+        failures.append(f"import {result['import']['median_ms']} ms > {args.max_import_ms} ms")
+    if args.max_first_request_ms is not None and result["first_request"]["median_ms"] > args.max_first_request_ms:
+        failures.append(f"first_request {result['first_request']['median_ms']} ms > {args.max_first_request_ms} ms")
+    if failures:
+        print("\n上限を超えました:")
+        for line in failures:
+            print(f"  {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+タスクの完了切り替え（toggle）のスループット比較
+
+    python -m benchmarks.toggle_bench --toggles 5000 --threads 4
+
+次の3つを比較します。
+    legacy      従来の SELECT → UPDATE(commit) → SELECT(refresh)（3文、変更バージョン・件数の更新なし）
+    legacy+ver  legacy に crud.toggle_todo と同じ変更バージョン・件数の更新を加えたもの（5文）
+    returning   crud.toggle_todo（変更バージョンの UPDATE、タスクの UPDATE ... RETURNING、件数の UPDATE の3文）
+タスク自体の読み書きは UPDATE ... RETURNING の1文ですが、変更バージョンと件数の更新が加わるため
+同じ処理を行う legacy+ver と比較してください（legacy は処理内容が少ないため単純には比較できません）。
+--threads を指定すると同じタスクを並列に切り替え、最終状態が回数と一致するかも確認します。
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app import crud
+from app.database import Base
+from app.models import Todo, User
+
+
+# 変更前の実装（SELECT で読み込み、Python側で反転してコミット後に refresh）
+def legacy_toggle(db, user_id: int, todo_id: int):
+    task = db.query(Todo).filter(Todo.id == todo_id, Todo.user_id == user_id).first()
+    task.completed = not task.completed
+    db.commit()
+    db.refresh(task)
+    return task
+
+
+# 変更前の実装に、crud.toggle_todo と同じ変更バージョン・件数の更新を加えたもの
+def legacy_toggle_with_version(db, user_id: int, todo_id: int):
+    task = db.query(Todo).filter(Todo.id == todo_id, Todo.user_id == user_id).first()
+    task.version = crud._bump_version(db, user_id)
+    task.completed = not task.completed
+    db.flush()
+    crud._adjust_stats(db, user_id, completed=1 if task.completed else -1)
+    db.commit()
+    db.refresh(task)
+    return task
+
+
+def run(name, toggle, Session, user_id, todo_id, toggles, threads, statements):
+    per_thread = toggles // threads
+    statements.clear()
+
+    def worker():
+        db = Session()
+        try:
+            for _ in range(per_thread):
+                toggle(db, user_id, todo_id)
+        finally:
+            db.close()
+
+    db = Session()
+    db.query(Todo).filter(Todo.id == todo_id).update({"completed": False})
+    db.commit()
+    db.close()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+
+    # 偶数回の切り替えなら最終状態は False になるはず
+    db = Session()
+    final = db.query(Todo.completed).filter(Todo.id == todo_id).scalar()
+    db.close()
+    total = per_thread * threads
+    expected = total % 2 == 1
+    print(
+        f"{name:<10} {total / elapsed:>10.0f} toggles/s  "
+        f"statements/toggle={len(statements) / total:.1f}  "
+        f"final_state_ok={final == expected}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--toggles", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "toggle_bench.db")
+    engine = create_engine(
+        f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 30}
+    )
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db = Session()
+    user = User(username="bench", email="bench@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    todo = Todo(title="bench", user_id=user.id)
+    db.add(todo)
+    db.commit()
+    user_id, todo_id = user.id, todo.id
+    db.close()
+
+    for name, toggle in (("legacy", legacy_toggle), ("legacy+ver", legacy_toggle_with_version), ("returning", crud.toggle_todo)):
+        run(name, toggle, Session, user_id, todo_id, args.toggles, args.threads, statements)
+
+    engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
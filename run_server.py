@@ -11,6 +11,10 @@ if __name__ == "__main__":
     
     # アプリケーションディレクトリに移動
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    # スキーマを最新にする（自動リロードで起動し直すたびには実行しない）
+    from app.serve import migrate
+    migrate()
     
     uvicorn.run(
         "app.main:app", 
@@ -0,0 +1,67 @@
+"""
+テスト共通の設定
+app を import する前に一時ディレクトリの SQLite を DATABASE_URL に設定し、python -m app.migrate でスキーマを作成する
+ユーザーはテストごとに新しく登録するため、テスト間でデータは共有しない
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+
+TEST_DIR = tempfile.mkdtemp(prefix="todo-backend-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}"
+# bcrypt はスレッドプールで実行し、コストを下げてテストを速くする
+os.environ.setdefault("BCRYPT_WORKERS", "0")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("LOG_FORMAT", "text")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    subprocess.run([sys.executable, "-m", "app.migrate"], cwd=ROOT_DIR, env=os.environ, check=True, capture_output=True)
+
+
+@pytest.fixture
+def client():
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+# ユーザーを登録してログインし、トークンのレスポンスを返す
+def register_and_login(client: TestClient) -> dict:
+    username = f"user-{uuid.uuid4().hex[:12]}"
+    password = "password123"
+    response = client.post("/auth/register", json={"username": username, "email": f"{username}@example.com", "password": password})
+    assert response.status_code == 200, response.text
+    response = client.post("/auth/login", json={"username": username, "password": password})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+@pytest.fixture
+def tokens(client):
+    return register_and_login(client)
+
+
+@pytest.fixture
+def auth_headers(tokens):
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+
+@pytest.fixture
+def create_todo(client, auth_headers):
+    def create(title: str = "タスク", details: str = "詳細") -> dict:
+        response = client.post("/todos", json={"title": title, "details": details}, headers=auth_headers)
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    return create
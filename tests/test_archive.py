@@ -0,0 +1,62 @@
+"""古い完了済みタスクのアーカイブ"""
+import asyncio
+import json
+from datetime import datetime
+
+from app.archive import archive_completed
+
+# 他のテストのタスク（2024年以降の日時）を対象にしないよう、2010年より前に更新されたものだけを移す
+OLDER_THAN_DAYS = (datetime.utcnow() - datetime(2010, 1, 1)).days
+
+
+def run_archive(**options) -> dict:
+    return asyncio.run(archive_completed(older_than_days=OLDER_THAN_DAYS, batch_size=2, pause_ms=0, **options))
+
+
+def test_archive_moves_old_completed_todos_in_batches(client, auth_headers):
+    body = "\n".join(json.dumps(todo) for todo in [
+        *({"title": f"archivable {i}", "completed": True, "createdAt": f"2000-01-0{i + 1}T00:00:00", "updatedAt": "2000-01-10T00:00:00"} for i in range(3)),
+        {"title": "archivable pending", "completed": False, "updatedAt": "2000-01-10T00:00:00"},
+        {"title": "archivable recent", "completed": True},
+    ]).encode()
+    assert client.post("/todos/import", content=body, headers=auth_headers).json()["imported"] == 5
+    before = client.get("/todos/changes", params={"since": 2 ** 31}, headers=auth_headers).json()["version"]
+
+    # バッチごとにコミットするため、max_batches で止めても次回の実行で続きから再開する
+    assert run_archive(max_batches=1)["moved"] == 2
+    assert run_archive(max_batches=1)["moved"] == 1
+    assert run_archive()["moved"] == 0
+
+    remaining = client.get("/todos", params={"legacy": "true"}, headers=auth_headers).json()
+    assert sorted(todo["title"] for todo in remaining) == ["archivable pending", "archivable recent"]
+    assert client.get("/todos/stats", headers=auth_headers).json() == {"total": 2, "completed": 1, "pending": 1, "archived": 3}
+
+    first = client.get("/todos/archive", params={"limit": 2}, headers=auth_headers).json()
+    second = client.get("/todos/archive", params={"limit": 2, "cursor": first["next_cursor"]}, headers=auth_headers).json()
+    archived = first["items"] + second["items"]
+    assert [todo["title"] for todo in archived] == ["archivable 0", "archivable 1", "archivable 2"]
+    assert second["next_cursor"] is None
+    assert all(todo["completed"] and todo["archivedAt"] for todo in archived)
+
+    # 差分取得では削除として伝わる
+    changes = client.get("/todos/changes", params={"since": before}, headers=auth_headers).json()
+    assert sorted(changes["deleted"]) == sorted(todo["id"] for todo in archived)
+    assert changes["items"] == []
+
+    # 検索の対象からも外れる
+    found = client.get("/todos/search", params={"q": "archivable"}, headers=auth_headers).json()["items"]
+    assert sorted(todo["title"] for todo in found) == ["archivable pending", "archivable recent"]
+
+
+def test_archive_ignores_recent_and_pending_todos(client, auth_headers, create_todo):
+    todo = create_todo("最近完了")
+    client.put(f"/todos/{todo['id']}/toggle", headers=auth_headers)
+
+    run_archive()
+
+    assert client.get("/todos/archive", headers=auth_headers).json() == {"items": [], "next_cursor": None}
+    assert client.get("/todos/stats", headers=auth_headers).json()["archived"] == 0
+
+
+def test_archive_rejects_invalid_cursor(client, auth_headers):
+    assert client.get("/todos/archive", params={"cursor": "not-a-cursor"}, headers=auth_headers).status_code == 400
@@ -0,0 +1,46 @@
+"""リフレッシュトークンのローテーションと再利用時の失効"""
+
+
+def refresh(client, refresh_token: str):
+    return client.post("/auth/refresh", json={"refresh_token": refresh_token})
+
+
+def test_refresh_rotates_token(client, tokens):
+    response = refresh(client, tokens["refresh_token"])
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["refresh_token"] != tokens["refresh_token"]
+    assert client.get("/todos/stats", headers={"Authorization": f"Bearer {body['access_token']}"}).status_code == 200
+    assert refresh(client, body["refresh_token"]).status_code == 200
+
+
+def test_reused_refresh_token_revokes_family(client, tokens):
+    rotated = refresh(client, tokens["refresh_token"]).json()["refresh_token"]
+
+    # 使用済みのトークンの再利用：拒否して同じログインのトークンをすべて失効させる
+    reused = refresh(client, tokens["refresh_token"])
+    assert reused.status_code == 401
+    assert reused.headers["WWW-Authenticate"] == "Bearer"
+    assert refresh(client, rotated).status_code == 401
+
+
+def test_reuse_does_not_revoke_other_logins(client):
+    credentials = {"username": "refresh-user", "password": "password123"}
+    client.post("/auth/register", json={**credentials, "email": "refresh-user@example.com"})
+    first = client.post("/auth/login", json=credentials).json()["refresh_token"]
+    second = client.post("/auth/login", json=credentials).json()["refresh_token"]
+
+    refresh(client, first)
+    assert refresh(client, first).status_code == 401
+    # 別のログインで発行された系列は有効なまま
+    assert refresh(client, second).status_code == 200
+
+
+def test_logout_revokes_refresh_token(client, tokens):
+    assert client.post("/auth/logout", json={"refresh_token": tokens["refresh_token"]}).status_code == 200
+    assert refresh(client, tokens["refresh_token"]).status_code == 401
+
+
+def test_unknown_refresh_token_is_rejected(client):
+    assert refresh(client, "unknown-token").status_code == 401
@@ -0,0 +1,63 @@
+"""POST /todos/batch（atomic / 非 atomic）"""
+
+
+def list_titles(client, auth_headers) -> set:
+    response = client.get("/todos", params={"legacy": "true"}, headers=auth_headers)
+    return {todo["title"] for todo in response.json()}
+
+
+def test_atomic_batch_commits_all_operations(client, auth_headers, create_todo):
+    existing = create_todo("既存")
+    deleted = create_todo("削除")
+    response = client.post("/todos/batch", json={"operations": [
+        {"op": "create", "title": "新規"},
+        {"op": "toggle", "id": existing["id"]},
+        {"op": "delete", "id": deleted["id"]},
+    ]}, headers=auth_headers)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["committed"] is True
+    assert [result["status"] for result in body["results"]] == [201, 200, 200]
+    assert body["results"][1]["todo"]["completed"] is True
+    assert list_titles(client, auth_headers) == {"新規", "既存"}
+
+
+def test_atomic_batch_rolls_back_on_failure(client, auth_headers, create_todo):
+    existing = create_todo("既存")
+    response = client.post("/todos/batch", json={"operations": [
+        {"op": "create", "title": "新規"},
+        {"op": "toggle", "id": existing["id"]},
+        {"op": "update", "id": existing["id"] + 100000, "title": "存在しない"},
+        {"op": "delete", "id": existing["id"]},
+    ]}, headers=auth_headers)
+
+    assert response.status_code == 409
+    body = response.json()
+    assert body["committed"] is False
+    # 失敗した操作より後の操作は実行されない
+    assert [result["status"] for result in body["results"]] == [201, 200, 404, 424]
+    # ロールバックされた行は返さず、何も反映されていない
+    assert all(result["todo"] is None for result in body["results"])
+    assert list_titles(client, auth_headers) == {"既存"}
+    assert client.get("/todos/stats", headers=auth_headers).json()["completed"] == 0
+
+
+def test_non_atomic_batch_keeps_successful_operations(client, auth_headers, create_todo):
+    existing = create_todo("既存")
+    response = client.post("/todos/batch", json={"atomic": False, "operations": [
+        {"op": "create", "title": "新規"},
+        {"op": "delete", "id": existing["id"] + 100000},
+        {"op": "update", "id": existing["id"], "title": "更新後"},
+    ]}, headers=auth_headers)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["committed"] is True
+    assert [result["status"] for result in body["results"]] == [201, 404, 200]
+    assert list_titles(client, auth_headers) == {"新規", "更新後"}
+
+
+def test_batch_rejects_operation_without_required_fields(client, auth_headers):
+    response = client.post("/todos/batch", json={"operations": [{"op": "toggle"}]}, headers=auth_headers)
+    assert response.status_code == 422
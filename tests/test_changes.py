@@ -0,0 +1,90 @@
+"""一覧の ETag / 304 と GET /todos/changes"""
+import os
+import sqlite3
+import subprocess
+import sys
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app import crud
+from tests.conftest import ROOT_DIR, TEST_DIR
+
+
+def test_list_returns_304_until_todos_change(client, auth_headers, create_todo):
+    create_todo("1件目")
+    first = client.get("/todos", headers=auth_headers)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    not_modified = client.get("/todos", headers={**auth_headers, "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+    assert not_modified.content == b""
+
+    create_todo("2件目")
+    changed = client.get("/todos", headers={**auth_headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(changed.json()["items"]) == 2
+
+
+def test_etag_depends_on_query_parameters(client, auth_headers, create_todo):
+    create_todo()
+    etag = client.get("/todos", headers=auth_headers).headers["ETag"]
+    response = client.get("/todos", params={"completed": "true"}, headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_changes_returns_updates_and_deletions_since_version(client, auth_headers, create_todo):
+    kept = create_todo("残す")
+    removed = create_todo("削除")
+    initial = client.get("/todos/changes", headers=auth_headers).json()
+    assert {todo["id"] for todo in initial["items"]} == {kept["id"], removed["id"]}
+    assert initial["deleted"] == []
+
+    client.put(f"/todos/{kept['id']}/toggle", headers=auth_headers)
+    client.delete(f"/todos/{removed['id']}", headers=auth_headers)
+    changes = client.get("/todos/changes", params={"since": initial["version"]}, headers=auth_headers).json()
+    assert changes["version"] == initial["version"] + 2
+    assert [todo["id"] for todo in changes["items"]] == [kept["id"]]
+    assert changes["items"][0]["completed"] is True
+    assert changes["deleted"] == [removed["id"]]
+
+    latest = client.get("/todos/changes", params={"since": changes["version"]}, headers=auth_headers).json()
+    assert latest == {"version": changes["version"], "items": [], "deleted": []}
+
+
+def test_changes_rejects_negative_version(client, auth_headers):
+    assert client.get("/todos/changes", params={"since": -1}, headers=auth_headers).status_code == 422
+
+
+def test_changes_requires_authentication(client):
+    assert client.get("/todos/changes").status_code == 401
+
+
+def test_changes_include_todos_created_before_versioning():
+    path = os.path.join(TEST_DIR, "before-versioning.db")
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{path}"}
+
+    def alembic(*args):
+        subprocess.run([sys.executable, "-m", "alembic", *args], cwd=ROOT_DIR, env=env, check=True, capture_output=True)
+
+    # バージョン列を追加する前（0001）のDBに作成されたタスク
+    alembic("upgrade", "0001")
+    with sqlite3.connect(path) as connection:
+        connection.execute("INSERT INTO users (id, username, email, hashed_password) VALUES (1, 'legacy', 'legacy@example.com', 'x')")
+        connection.execute("INSERT INTO todos (title, completed, createdAt, updatedAt, user_id) VALUES ('既存', 0, '2024-01-01', '2024-01-01', 1)")
+    alembic("upgrade", "head")
+
+    engine = create_engine(env["DATABASE_URL"])
+    try:
+        with Session(engine) as db:
+            version, items, deleted = crud.list_changes(db, 1, 0)
+    finally:
+        engine.dispose()
+    assert version == 1
+    assert [todo.title for todo in items] == ["既存"]
+    assert deleted == []
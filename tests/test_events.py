@@ -0,0 +1,127 @@
+"""変更イベント（Server-Sent Events）"""
+import asyncio
+
+import pytest
+
+from app import events
+from app.events import EventBus, InMemoryEventBus, Subscription, TodoEvent
+
+
+def event(version: int, user_id: int = 1) -> TodoEvent:
+    return TodoEvent("updated", user_id, version, todo_id=version)
+
+
+def test_subscription_overflow_drops_queue_and_signals_reset():
+    async def run():
+        subscription = Subscription(user_id=1, max_size=2)
+        subscription.deliver(event(1))
+        subscription.deliver(event(2))
+        subscription.deliver(event(3))
+        # 満杯になった後のイベントは受け取らない
+        subscription.deliver(event(4))
+        assert subscription.overflowed
+        assert subscription.queue.qsize() == 1
+        assert await subscription.get(1) is None
+        with pytest.raises(asyncio.TimeoutError):
+            await subscription.get(0.01)
+
+    asyncio.run(run())
+
+
+def test_in_memory_bus_delivers_only_to_the_users_subscriptions():
+    async def run():
+        bus = InMemoryEventBus(queue_size=10)
+        mine = await bus.subscribe(1)
+        other = await bus.subscribe(2)
+        await bus.publish(event(5, user_id=1))
+        assert (await mine.get(1)).version == 5
+        assert other.queue.empty()
+
+        await bus.unsubscribe(mine)
+        await bus.unsubscribe(other)
+        await bus.unsubscribe(other)
+        assert bus.subscriber_count() == 0
+
+    asyncio.run(run())
+
+
+def test_event_bus_requires_all_methods():
+    class PublishOnly(EventBus):
+        async def publish(self, event):
+            pass
+
+    with pytest.raises(TypeError):
+        PublishOnly()
+
+
+# TestClient はストリームの終了までレスポンスを読むため、ASGI アプリを直接呼び出して
+# count 件のイベントを受け取ったところで切断する
+async def read_events(headers: dict, count: int, after_subscribe=None) -> tuple:
+    from app.main import app
+
+    disconnected = asyncio.Event()
+    request_sent = False
+    response = {"status": None, "body": b""}
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+            if response["body"].count(b"\n\n") >= count or not message.get("more_body"):
+                disconnected.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.3"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/todos/events", "raw_path": b"/todos/events",
+        "query_string": b"", "root_path": "", "client": ("testclient", 50000), "server": ("testserver", 80),
+        "headers": [(key.lower().encode(), value.encode()) for key, value in headers.items()],
+    }
+    request = asyncio.create_task(app(scope, receive, send))
+    if after_subscribe is not None:
+        while events.event_bus.subscriber_count() == 0:
+            await asyncio.sleep(0.01)
+        await after_subscribe()
+    await asyncio.wait_for(request, 5)
+    blocks = [block for block in response["body"].decode().split("\n\n") if block]
+    return response["status"], blocks
+
+
+def test_last_event_id_replays_changes_then_streams_new_events(client, auth_headers, create_todo):
+    kept = create_todo("残す")
+    removed = create_todo("削除")
+    client.delete(f"/todos/{removed['id']}", headers=auth_headers)
+    version = client.get("/todos/changes", params={"since": 2 ** 31}, headers=auth_headers).json()["version"]
+
+    async def publish_live():
+        # 再送済みのバージョンは送らず、それより新しいイベントだけを送る
+        await events.publish(TodoEvent("toggled", kept["user_id"], version, kept["id"]))
+        await events.publish(TodoEvent("toggled", kept["user_id"], version + 1, kept["id"]))
+
+    status, blocks = asyncio.run(read_events({**auth_headers, "Last-Event-ID": "0"}, 4, publish_live))
+
+    assert status == 200
+    assert blocks[0] == "retry: 3000"
+    assert blocks[1].startswith(f"id: {version}\nevent: deleted\n")
+    assert blocks[2].startswith(f"id: {version}\nevent: changed\n")
+    assert f'"id":{kept["id"]}' in blocks[2]
+    assert blocks[3].startswith(f"id: {version + 1}\nevent: toggled\n")
+    assert events.event_bus.subscriber_count() == 0
+
+
+def test_invalid_last_event_id_is_rejected(client, auth_headers):
+    response = client.get("/todos/events", headers={**auth_headers, "Last-Event-ID": "abc"})
+    assert response.status_code == 400
+    assert events.event_bus.subscriber_count() == 0
+
+
+def test_events_require_authentication(client):
+    assert client.get("/todos/events").status_code == 401
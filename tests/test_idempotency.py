@@ -0,0 +1,56 @@
+"""Idempotency-Key によるタスク作成の重複防止"""
+from app.routes.idempotency import idempotency_store
+from tests.conftest import register_and_login
+
+
+def count_todos(client, auth_headers) -> int:
+    return client.get("/todos/stats", headers=auth_headers).json()["total"]
+
+
+def test_retry_with_same_key_replays_first_response(client, auth_headers):
+    headers = {**auth_headers, "Idempotency-Key": "create-1"}
+    first = client.post("/todos", json={"title": "再送"}, headers=headers)
+    retry = client.post("/todos", json={"title": "再送"}, headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert count_todos(client, auth_headers) == 1
+
+
+def test_same_key_with_different_body_is_rejected(client, auth_headers):
+    headers = {**auth_headers, "Idempotency-Key": "create-1"}
+    assert client.post("/todos", json={"title": "最初"}, headers=headers).status_code == 200
+
+    conflict = client.post("/todos", json={"title": "別の内容"}, headers=headers)
+    assert conflict.status_code == 422
+    assert count_todos(client, auth_headers) == 1
+
+
+def test_keys_are_scoped_per_user_and_validated(client, auth_headers):
+    other_headers = {"Authorization": f"Bearer {register_and_login(client)['access_token']}"}
+    assert client.post("/todos", json={"title": "a"}, headers={**auth_headers, "Idempotency-Key": "k"}).status_code == 200
+    # 別のユーザーが同じキーを使っても再送とはみなさない
+    other = client.post("/todos", json={"title": "b"}, headers={**other_headers, "Idempotency-Key": "k"})
+    assert other.status_code == 200
+    assert "Idempotent-Replayed" not in other.headers
+    assert count_todos(client, auth_headers) == count_todos(client, other_headers) == 1
+
+    too_long = client.post("/todos", json={"title": "c"}, headers={**auth_headers, "Idempotency-Key": "x" * 256})
+    assert too_long.status_code == 400
+
+
+def test_json_route_replays_from_database(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(idempotency_store, "use_db", True)
+    headers = {**auth_headers, "Idempotency-Key": "json-1"}
+    first = client.post("/todos/json", json={"title": "DB"}, headers=headers)
+    assert first.status_code == 200
+
+    # 別プロセス・再起動後を想定して、プロセス内のストアを空にしてから再送する
+    idempotency_store.clear()
+    retry = client.post("/todos/json", json={"title": "DB"}, headers=headers)
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert client.post("/todos/json", json={"title": "変更"}, headers=headers).status_code == 422
+    assert count_todos(client, auth_headers) == 1
@@ -0,0 +1,47 @@
+"""NDJSON のインポート・エクスポート"""
+import json
+
+from app.routes import todos
+
+
+def ndjson(*lines) -> bytes:
+    return "\n".join(line if isinstance(line, str) else json.dumps(line, ensure_ascii=False) for line in lines).encode()
+
+
+def test_import_commits_in_chunks(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(todos, "TODO_IMPORT_CHUNK_SIZE", 2)
+    body = ndjson(
+        {"title": "a"},
+        {"title": "b", "completed": True},
+        "",
+        {"title": "c", "details": "詳細", "createdAt": "2024-01-02T03:04:05+09:00"},
+    )
+    response = client.post("/todos/import", content=body, headers={**auth_headers, "Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    assert response.json() == {"imported": 3, "failed": 0, "chunks": 2, "errors": []}
+    exported = [json.loads(line) for line in client.get("/todos/export", headers=auth_headers).text.splitlines()]
+    assert sorted(todo["title"] for todo in exported) == ["a", "b", "c"]
+    # タイムゾーン付きの日時は UTC に変換して保存する
+    assert next(todo for todo in exported if todo["title"] == "c")["createdAt"] == "2024-01-01T18:04:05"
+    assert client.get("/todos/stats", headers=auth_headers).json()["completed"] == 1
+
+
+def test_import_reports_invalid_lines_with_line_numbers(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(todos, "TODO_IMPORT_MAX_LINE_BYTES", 100)
+    body = ndjson(
+        {"title": "ok"},
+        "{not json",
+        {"details": "タイトルなし"},
+        {"title": "x" * 200},
+        {"title": "ok2"},
+    )
+    response = client.post("/todos/import", content=body, headers=auth_headers)
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["imported"] == 2
+    assert result["failed"] == 3
+    assert [error["line"] for error in result["errors"]] == [2, 3, 4]
+    assert result["errors"][1]["error"].startswith("title:")
+    assert "行が長すぎます" in result["errors"][2]["error"]
@@ -0,0 +1,44 @@
+"""ログ設定（QueueHandler / QueueListener）"""
+import logging
+import logging.handlers
+
+import pytest
+
+from app import logging_config
+
+
+@pytest.fixture
+def root_handlers():
+    # テスト後に元のハンドラーに戻す（capsys の出力先を残さない）
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield
+    logging_config.shutdown_logging()
+    root.handlers, root.level = handlers, level
+
+
+def test_logs_after_shutdown_are_written_directly(root_handlers, capsys):
+    logger = logging.getLogger("tests.logging")
+    logging_config.setup_logging()
+    logger.error("キュー経由")
+    logging_config.shutdown_logging()
+
+    assert logging_config.queue_handler is None
+    assert not any(isinstance(handler, logging.handlers.QueueHandler) for handler in logging.getLogger().handlers)
+    logger.error("停止後")
+    output = capsys.readouterr().out
+    assert "キュー経由" in output
+    assert "停止後" in output
+
+
+def test_logging_can_be_set_up_again_after_shutdown(root_handlers, capsys):
+    logger = logging.getLogger("tests.logging")
+    logging_config.setup_logging()
+    logging_config.shutdown_logging()
+    logging_config.setup_logging()
+    logger.error("再設定後")
+    logging_config.shutdown_logging()
+
+    output = capsys.readouterr().out
+    assert output.count("再設定後") == 1
+    assert len(logging.getLogger().handlers) == 1
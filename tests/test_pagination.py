@@ -0,0 +1,110 @@
+"""タスク一覧のキーセットページネーション・フィルター・項目指定"""
+import json
+
+import pytest
+
+
+@pytest.fixture
+def import_todos(client, auth_headers):
+    # createdAt / updatedAt を指定してタスクを作成する（インポート経由）
+    def create(*todos: dict) -> None:
+        body = "\n".join(json.dumps(todo) for todo in todos).encode()
+        response = client.post("/todos/import", content=body, headers=auth_headers)
+        assert response.json()["imported"] == len(todos), response.text
+
+    return create
+
+
+def fetch_all_pages(client, auth_headers, **params) -> list:
+    items, cursor = [], None
+    while True:
+        page = client.get("/todos", params={**params, **({"cursor": cursor} if cursor else {})}, headers=auth_headers)
+        assert page.status_code == 200, page.text
+        body = page.json()
+        assert len(body["items"]) <= params.get("limit", 50)
+        items += body["items"]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return items
+
+
+def test_pages_do_not_overlap_or_skip_rows_with_equal_timestamps(client, auth_headers, import_todos):
+    import_todos(
+        {"title": "late", "createdAt": "2024-01-03T00:00:00"},
+        *({"title": f"same-{i}", "createdAt": "2024-01-02T00:00:00"} for i in range(5)),
+        {"title": "early", "createdAt": "2024-01-01T00:00:00"},
+    )
+
+    items = fetch_all_pages(client, auth_headers, limit=2)
+
+    assert len(items) == len({item["id"] for item in items}) == 7
+    # (createdAt, id) の昇順
+    assert [(item["createdAt"], item["id"]) for item in items] == sorted((item["createdAt"], item["id"]) for item in items)
+    assert items[0]["title"] == "early"
+    assert items[-1]["title"] == "late"
+
+
+def test_last_page_has_no_cursor(client, auth_headers, create_todo):
+    create_todo()
+    create_todo()
+    body = client.get("/todos", params={"limit": 2}, headers=auth_headers).json()
+    assert len(body["items"]) == 2
+    assert body["next_cursor"] is None
+
+
+def test_filters_exclude_boundaries(client, auth_headers, import_todos):
+    import_todos(
+        {"title": "a", "createdAt": "2024-01-01T00:00:00", "updatedAt": "2024-02-01T00:00:00"},
+        {"title": "b", "createdAt": "2024-01-02T00:00:00", "updatedAt": "2024-02-02T00:00:00", "completed": True},
+        {"title": "c", "createdAt": "2024-01-03T00:00:00", "updatedAt": "2024-02-03T00:00:00"},
+    )
+
+    def titles(**params) -> list:
+        response = client.get("/todos", params=params, headers=auth_headers)
+        assert response.status_code == 200, response.text
+        return [item["title"] for item in response.json()["items"]]
+
+    assert titles(completed="true") == ["b"]
+    assert titles(completed="false") == ["a", "c"]
+    assert titles(created_after="2024-01-01T00:00:00", created_before="2024-01-03T00:00:00") == ["b"]
+    assert titles(updated_after="2024-02-02T00:00:00") == ["c"]
+    assert titles(updated_before="2024-02-02T00:00:00") == ["a"]
+    # タイムゾーン付きの日時は UTC に変換して比較する
+    assert titles(created_after="2024-01-02T09:00:00+09:00") == ["c"]
+    assert titles(created_after="2024-01-01T00:00:00", completed="false") == ["c"]
+
+
+def test_fields_limit_returned_items(client, auth_headers, create_todo):
+    create_todo("項目指定")
+    body = client.get("/todos", params={"fields": "title,id"}, headers=auth_headers).json()
+    # 並び順はレスポンススキーマに合わせる
+    assert list(body["items"][0]) == ["title", "id"]
+    assert body["items"][0]["title"] == "項目指定"
+
+    response = client.get("/todos", params={"fields": "id,password"}, headers=auth_headers)
+    assert response.status_code == 400
+    assert "password" in response.json()["detail"]
+
+
+def test_invalid_cursor_is_rejected(client, auth_headers):
+    for cursor in ("not-a-cursor", "e30"):
+        response = client.get("/todos", params={"cursor": cursor}, headers=auth_headers)
+        assert response.status_code == 400
+        assert "無効なカーソル" in response.json()["detail"]
+
+
+def test_limit_is_validated(client, auth_headers):
+    assert client.get("/todos", params={"limit": 0}, headers=auth_headers).status_code == 422
+    assert client.get("/todos", params={"limit": 501}, headers=auth_headers).status_code == 422
+
+
+def test_legacy_mode_returns_all_todos_as_list(client, auth_headers, create_todo):
+    for i in range(3):
+        create_todo(f"legacy-{i}")
+    response = client.get("/todos", params={"legacy": "true", "limit": 1, "cursor": "ignored"}, headers=auth_headers)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert isinstance(body, list)
+    assert sorted(todo["title"] for todo in body) == ["legacy-0", "legacy-1", "legacy-2"]
+    assert client.get("/todos", params={"legacy": "true", "completed": "true"}, headers=auth_headers).json() == []
@@ -0,0 +1,93 @@
+"""全文検索（SQLite FTS5）"""
+import os
+import re
+
+from sqlalchemy import create_engine, text
+
+from app import models  # noqa: F401  モデルをメタデータに登録
+from app.database import Base, engine
+from tests.conftest import TEST_DIR, register_and_login
+
+
+def search(client, auth_headers, q: str, **params):
+    return client.get("/todos/search", params={"q": q, **params}, headers=auth_headers)
+
+
+def titles(client, auth_headers, q: str) -> list:
+    response = search(client, auth_headers, q)
+    assert response.status_code == 200, response.text
+    return [todo["title"] for todo in response.json()["items"]]
+
+
+def fts_schema(bind) -> dict:
+    with bind.connect() as connection:
+        rows = connection.execute(text(
+            "SELECT name, sql FROM sqlite_master WHERE name LIKE 'todos_fts%' AND sql IS NOT NULL"
+        )).all()
+    return {name: re.sub(r"\s+", " ", sql) for name, sql in rows}
+
+
+def test_create_all_and_migration_define_same_fts_schema():
+    # app/models.py と alembic 0003 の2か所にある定義が一致していること
+    created = create_engine(f"sqlite:///{os.path.join(TEST_DIR, 'create-all.db')}")
+    try:
+        Base.metadata.create_all(bind=created)
+        expected = fts_schema(created)
+    finally:
+        created.dispose()
+    assert {"todos_fts", "todos_fts_ai", "todos_fts_ad", "todos_fts_au"} <= set(expected)
+    assert fts_schema(engine) == expected
+
+
+def test_search_matches_all_terms_with_prefix_on_last(client, auth_headers, create_todo):
+    create_todo("Buy milk", "from the store")
+    create_todo("Milk tea", "")
+    create_todo("Walk dog", "milky way")
+
+    assert sorted(titles(client, auth_headers, "mil")) == ["Buy milk", "Milk tea", "Walk dog"]
+    assert titles(client, auth_headers, "milk bu") == ["Buy milk"]
+    # 最後の語以外は前方一致にしない（milky は milk に一致しない）
+    assert titles(client, auth_headers, "milk w") == []
+    assert titles(client, auth_headers, "milky w") == ["Walk dog"]
+
+
+def test_search_ranks_title_matches_first_and_paginates(client, auth_headers, create_todo):
+    create_todo("note", "report")
+    create_todo("report", "note")
+    for i in range(3):
+        create_todo(f"other {i}", "report")
+
+    first = search(client, auth_headers, "report", limit=2).json()
+    assert first["items"][0]["title"] == "report"
+
+    items, cursor = first["items"], first["next_cursor"]
+    while cursor:
+        page = search(client, auth_headers, "report", limit=2, cursor=cursor).json()
+        items += page["items"]
+        cursor = page["next_cursor"]
+    assert len(items) == len({todo["id"] for todo in items}) == 5
+
+
+def test_index_follows_update_and_delete(client, auth_headers, create_todo):
+    todo = create_todo("draft proposal", "")
+    client.put(f"/todos/{todo['id']}", json={"title": "final proposal"}, headers=auth_headers)
+    client.put(f"/todos/{todo['id']}/toggle", headers=auth_headers)
+
+    assert titles(client, auth_headers, "draft") == []
+    assert titles(client, auth_headers, "final") == ["final proposal"]
+
+    client.delete(f"/todos/{todo['id']}", headers=auth_headers)
+    assert titles(client, auth_headers, "proposal") == []
+
+
+def test_search_is_scoped_to_user(client, auth_headers, create_todo):
+    create_todo("shared word", "")
+    other_headers = {"Authorization": f"Bearer {register_and_login(client)['access_token']}"}
+    assert titles(client, other_headers, "shared") == []
+
+
+def test_search_rejects_invalid_queries(client, auth_headers):
+    assert search(client, auth_headers, "!!! ??").status_code == 400
+    assert search(client, auth_headers, '"').status_code == 400
+    assert search(client, auth_headers, "").status_code == 422
+    assert search(client, auth_headers, "word", cursor="not-a-cursor").status_code == 400
@@ -0,0 +1,67 @@
+"""タスク件数（user_todo_stats）と再集計"""
+import sys
+
+import pytest
+from sqlalchemy import update
+
+from app import crud, stats
+from app.database import SessionLocal
+from app.models import UserTodoStats
+
+
+def get_stats(client, auth_headers) -> dict:
+    return client.get("/todos/stats", headers=auth_headers).json()
+
+
+def user_drift(drift: list, user_id: int) -> list:
+    return [item for item in drift if item["user_id"] == user_id]
+
+
+def test_stats_follow_writes(client, auth_headers, create_todo):
+    first = create_todo()
+    second = create_todo()
+    client.put(f"/todos/{first['id']}/toggle", headers=auth_headers)
+    client.delete(f"/todos/{second['id']}", headers=auth_headers)
+
+    assert get_stats(client, auth_headers) == {"total": 1, "completed": 1, "pending": 0, "archived": 0}
+    with SessionLocal() as db:
+        assert user_drift(crud.reconcile_todo_stats(db, fix=False), first["user_id"]) == []
+
+
+def test_reconcile_repairs_drift(client, auth_headers, create_todo):
+    user_id = create_todo()["user_id"]
+    create_todo()
+    with SessionLocal() as db:
+        db.execute(update(UserTodoStats).where(UserTodoStats.user_id == user_id).values(total=10, completed=3))
+        db.commit()
+
+        drift = user_drift(crud.reconcile_todo_stats(db, fix=False), user_id)
+        assert drift == [{
+            "user_id": user_id,
+            "stored": {"total": 10, "completed": 3, "archived": 0},
+            "actual": {"total": 2, "completed": 0, "archived": 0},
+        }]
+        # 比較だけの場合は変更しない
+        assert get_stats(client, auth_headers)["total"] == 10
+
+        assert user_drift(crud.reconcile_todo_stats(db, fix=True), user_id) == drift
+        assert crud.reconcile_todo_stats(db, fix=False) == []
+    assert get_stats(client, auth_headers) == {"total": 2, "completed": 0, "pending": 2, "archived": 0}
+
+
+def test_check_command_exits_with_error_on_drift(client, create_todo, monkeypatch, capsys):
+    user_id = create_todo()["user_id"]
+    with SessionLocal() as db:
+        db.execute(update(UserTodoStats).where(UserTodoStats.user_id == user_id).values(total=0))
+        db.commit()
+
+    monkeypatch.setattr(sys, "argv", ["app.stats", "--check"])
+    with pytest.raises(SystemExit) as exc_info:
+        stats.main()
+    assert exc_info.value.code == 1
+    assert f'"user_id": {user_id}' in capsys.readouterr().out
+
+    monkeypatch.setattr(sys, "argv", ["app.stats"])
+    stats.main()
+    monkeypatch.setattr(sys, "argv", ["app.stats", "--check"])
+    stats.main()
@@ -0,0 +1,75 @@
+"""書き込みのまとめ実行（WriteCoalescer）"""
+import asyncio
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.write_coalescer import WriteCoalescer, write_coalescer
+
+
+def stats(client, auth_headers) -> dict:
+    return client.get("/todos/stats", headers=auth_headers).json()
+
+
+def version(client, auth_headers) -> int:
+    return client.get("/todos/changes", params={"since": 2 ** 31}, headers=auth_headers).json()["version"]
+
+
+def test_concurrent_writes_are_committed_together(client, auth_headers, create_todo):
+    existing = create_todo("既存")
+    user_id = existing["user_id"]
+    before = version(client, auth_headers)
+    coalescer = WriteCoalescer(window_ms=50, max_batch=10)
+
+    async def run():
+        results = await asyncio.gather(
+            coalescer.create(user_id, {"title": "a", "details": None}),
+            coalescer.create(user_id, {"title": "b", "details": None}),
+            coalescer.toggle(user_id, existing["id"]),
+            coalescer.toggle(user_id, existing["id"] + 100000),
+        )
+        await coalescer.close()
+        return results
+
+    created_a, created_b, toggled, missing = asyncio.run(run())
+
+    assert (created_a.title, created_b.title) == ("a", "b")
+    assert toggled.completed is True
+    assert missing is None
+    # 1トランザクションにまとめられ、変更バージョンは1回だけ進む
+    assert created_a.version == created_b.version == toggled.version == before + 1
+    assert version(client, auth_headers) == before + 1
+    assert stats(client, auth_headers) == {"total": 3, "completed": 1, "pending": 2, "archived": 0}
+
+
+def test_failed_batch_is_retried_one_by_one(client, auth_headers, create_todo):
+    user_id = create_todo("既存")["user_id"]
+    coalescer = WriteCoalescer(window_ms=50, max_batch=10)
+
+    async def run():
+        results = await asyncio.gather(
+            coalescer.create(user_id, {"title": "a", "details": None}),
+            coalescer.create(user_id, {"title": ["保存できない値"], "details": None}),
+            coalescer.create(user_id, {"title": "c", "details": None}),
+            return_exceptions=True,
+        )
+        await coalescer.close()
+        return results
+
+    created_a, failed, created_c = asyncio.run(run())
+
+    # 失敗した書き込みだけが例外になり、他は個別に実行し直される
+    assert isinstance(failed, SQLAlchemyError)
+    assert (created_a.title, created_c.title) == ("a", "c")
+    assert created_a.version != created_c.version
+    assert stats(client, auth_headers)["total"] == 3
+
+
+def test_routes_use_coalescer_when_enabled(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(write_coalescer, "enabled", True)
+    created = client.post("/todos", json={"title": "まとめ実行"}, headers=auth_headers)
+    assert created.status_code == 200
+    toggled = client.put(f"/todos/{created.json()['id']}/toggle", headers=auth_headers)
+    assert toggled.status_code == 200
+    assert toggled.json()["completed"] is True
+    assert client.put(f"/todos/{created.json()['id'] + 100000}/toggle", headers=auth_headers).status_code == 404
+    assert write_coalescer.pending() == 0